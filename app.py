@@ -1,61 +1,58 @@
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
-import requests
-import json
-import pandas as pd
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
+import os
+import logging
 import datetime as dt
-import plotly.express as px
 import plotly.graph_objects as go
+from flask_compress import Compress
 
+import data
+import query
+import plots
+from figure_cache import FigureCache
+from metrics import registry
+
+logging.basicConfig(level=logging.INFO)
 
 #######################################
 ########DATAFRAME######################
 #######################################
-def earthquake(path, starttime, endtime, alert):
-    paramss = {"format": "geojson", "starttime": starttime, "endtime": endtime, "alertlevel": alert}
-    data = requests.get(path, params = paramss)
-    data = json.loads(data.text)
-    return data
-
-path = r"https://earthquake.usgs.gov/fdsnws/event/1/query?"
-green = earthquake(path, '2010-01-01', '2021-10-1', 'green')
-yellow = earthquake(path, '2010-01-01', '2021-10-1', 'yellow')
-orange = earthquake(path, '2010-01-01', '2021-10-1', 'orange')
-red = earthquake(path, '2010-01-01', '2021-10-1', 'red')
-
-# Convert the JSON to Pandas dataframe
-df_green = pd.json_normalize(green['features'])
-df_yellow = pd.json_normalize(yellow['features'])
-df_orange = pd.json_normalize(orange['features'])
-df_red = pd.json_normalize(red['features'])
-
-df = pd.concat([df_green, df_yellow, df_orange, df_red])
-
-def refactor_date(row):
-    actual_value = row['properties.time']
-    actual_time = dt.datetime.fromtimestamp(actual_value // 1000.0)
-    row['properties.time'] = actual_time
-    return row
-
-df = df.apply(refactor_date, axis='columns')
-
-df2 = df[['id', 'properties.mag', 'properties.place', 'properties.time', 'properties.detail', \
-'properties.felt', 'properties.cdi', 'properties.mmi', 'properties.alert', 'properties.tsunami', \
-'properties.sig', 'properties.net', 'properties.dmin', 'properties.type', 'geometry.coordinates']]
-df2.set_axis(['id', 'magnitude', 'location', 'time', 'detail', 'felt', 'cdi', 'mmi', 'alert', 'tsunami', 'sig', 'net', 'dmin', 'type', 'coordinates'], axis=1, inplace=True)
-df2.head()
-
-df2[['latitud', 'longitud', 'depth']] = pd.DataFrame(df2.coordinates.tolist(), index= df2.index) 
-
-# Filling Missing Values
-df2.felt = df2.felt.fillna(0)
-df2.cdi = df2.cdi.fillna(0)
-df2.dmin = df2.dmin.fillna(df2.dmin.median())
-df2.location = df2.location.fillna('Unknown')
-green_mag = df2.magnitude[df2.alert == 'green']
-df2.magnitude = df2.magnitude.fillna(green_mag.mean())
+# Loaded from the local cache when possible, USGS is only queried on a cold cache.
+# The load runs in the background so the server is up right away, /ready answers 503 until it is done.
+# With SYNC_INTERVAL (seconds) set the window stays open and new events are synced in the background
+SYNC_INTERVAL = int(os.environ.get('SYNC_INTERVAL', 0))
+store = data.EventStore(endtime=None if SYNC_INTERVAL else data.ENDTIME)
+store.start_load(SYNC_INTERVAL)
+
+# Page 1 can show any other date window. Its events come from files of one month each,
+# split from the cache of the store or fetched in the background when missing
+partitions = data.Partitions(seed=(store.starttime, store.endtime))
+
+# Figures already built for the same inputs and dataset version are served from memory,
+# or from FIGURE_CACHE_DIR when set, which the gunicorn workers can share.
+# Asking for the version waits for the first load, the callbacks below always find store.index set
+figures = FigureCache(lambda: store.wait().version,
+                      max_bytes=int(os.environ.get('FIGURE_CACHE_MB', 64)) * 10 ** 6,
+                      directory=os.environ.get('FIGURE_CACHE_DIR'),
+                      max_disk_bytes=int(os.environ.get('FIGURE_CACHE_DISK_MB', 512)) * 10 ** 6,
+                      stage=registry.stage)
+
+# Callback and ingest timings are served at /metrics, METRICS_LOG=1 also logs one JSON line per callback
+registry.structured = bool(int(os.environ.get('METRICS_LOG', 0)))
+
+# With CLIENTSIDE_FILTERING set the browser gets the whole table once per session and the
+# alert/tsunami filters of the scatter and the maps run there, without a server round trip
+CLIENTSIDE_FILTERING = bool(int(os.environ.get('CLIENTSIDE_FILTERING', 0)))
+
+# Most points the scatter plots get per call, past it they get a representative subset
+# and the full resolution once the user zooms in far enough
+POINT_BUDGET = int(os.environ.get('POINT_BUDGET', 4000))
+
+# Responses are compressed unless COMPRESS=0, when a proxy in front already does it
+COMPRESS = bool(int(os.environ.get('COMPRESS', 1)))
 
 #######################################
 ############ Dash App #################
@@ -64,391 +61,537 @@ df2.magnitude = df2.magnitude.fillna(green_mag.mean())
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
 
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.Div([
-        html.H1('Earthquake Dash App'),
-        html.Div([
-            dcc.Link('Page 1', href='/page-1'),
-            dcc.Link('Page 2', href='/page-2'),
-            dcc.Link('Page 3', href='/page-3')
-        ], className='nav_div')
-    ], className='nav'),
-    html.Div(id='page-content'),
-    html.Footer([
-        html.P('© 2021 Fernando Sirias / David Mairena'),
-        html.Div([
-            html.P('Data Source: '),
-            html.A('USGS', href='https://earthquake.usgs.gov/fdsnws/event/1/?ref=springboard', target='_blank')
-        ], className='source')
+# Not compress=True of Dash, it only allows gzip. The callback responses are long arrays of
+# numbers: brotli at level 4 gets them about as small as gzip at 6 (a 215 KB scatter to 54 KB)
+# in a third of the time. Browsers without brotli get gzip at level 3.
+# Registered before the metrics hook, which runs first and sees the uncompressed size
+if COMPRESS:
+    server.config.update(COMPRESS_ALGORITHM=['br', 'gzip'], COMPRESS_BR_LEVEL=4, COMPRESS_LEVEL=3)
+    Compress(server)
+
+
+@server.route('/ready')
+def ready():
+    status = store.status()
+    return status, 200 if status['ready'] else 503
+
+
+@server.route('/cache-stats')
+def cache_stats():
+    return figures.stats()
+
+
+@server.route('/metrics')
+def metrics():
+    stats = figures.stats()
+    status = store.status()
+    backfill = partitions.status()
+    text = registry.render([
+        ('figure_cache_hits_total', 'counter', 'Figures served from memory.', stats['hits']),
+        ('figure_cache_disk_hits_total', 'counter', 'Figures served from FIGURE_CACHE_DIR.', stats['disk_hits']),
+        ('figure_cache_misses_total', 'counter', 'Figures built.', stats['misses']),
+        ('figure_cache_bytes', 'gauge', 'Size of the figures in the memory cache.', stats['bytes']),
+        ('figure_cache_entries', 'gauge', 'Figures in the memory cache.', stats['entries']),
+        ('events', 'gauge', 'Rows of the event table.', status['rows'] or 0),
+        ('partition_bytes', 'gauge', 'Size of the month partitions in memory.', backfill['bytes']),
+        ('backfill_pending', 'gauge', 'Months being fetched for a date window.', backfill['pending']),
+        ('ready', 'gauge', '1 once the events are loaded.', status['ready'])
     ])
-], className='content_container')
+    return text, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
-default_layout= html.Div([
-    html.Div([
-        html.H2('PLEASE SELECT A PAGE'),
-        html.Img(src='https://media0.giphy.com/media/xT1R9JFTKhIpOYBvos/giphy.gif?cid=790b761186ce2b415be65a3c705bea87481b3dad7a3b6985&rid=giphy.gif&ct=g')
-    ], className='default_container')
-], className='default_layout')
 
-##################################### First Page ######################################### 
-first_page_layout = html.Div([
-        html.H1('Earthquakes from 2010 to 2021'),
-    html.Div([
-        html.Div(html.Label([
-            'Select an alert to filter:',
-            dcc.Dropdown(
-            id='page-1-dropdown', value='all', clearable=False,
-            options=[
-                {'label': 'Green', 'value': 'green'}, 
-                {'label': 'Yellow', 'value' : 'yellow'},
-                {'label': 'Orange', 'value': 'orange'},
-                {'label': 'Red', 'value': 'red'},
-                {'label': 'All', 'value': 'all'}]
-            )], className='filter_text'), className='inline'),
+server.after_request(registry.response)
+
+
+# The snapshot is built once per dataset version
+snapshots = {}
+
+
+def events_snapshot():
+    index = store.wait()
+    if index.version not in snapshots:
+        snapshots.clear()
+        snapshots[index.version] = plots.snapshot(index)
+    return snapshots[index.version]
+
+
+# Dash calls the layout on the first request of the server, /ready included, so it must not
+# wait for the load. The snapshot is sent by a callback once the page is up, again on a page
+# change only when the dataset version has changed since
+def serve_layout():
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        dcc.Store(id='events-data'),
+        dcc.Store(id='events-version'),
+        html.Div([
+            html.H1('Earthquake Dash App'),
             html.Div([
-                html.Label([
-                    'Tsunami alert:',
-                    dcc.RadioItems(
-                        id='tsunami_alert',
-                        value='default',
-                        options=[
-                            {'label': 'Default', 'value': 'default'},
-                            {'label': 'Yes', 'value': 0},
-                            {'label': 'No', 'value': 1}
-                        ]
-                    )
-                ])
-            ], className='inline'),
+                dcc.Link('Page 1', href='/page-1'),
+                dcc.Link('Page 2', href='/page-2'),
+                dcc.Link('Page 3', href='/page-3')
+            ], className='nav_div')
+        ], className='nav'),
+        html.Div(id='page-content'),
+        html.Footer([
+            html.P('© 2021 Fernando Sirias / David Mairena'),
             html.Div([
-                html.Label([
-                    'Select a year to filter:',
-                    dcc.Slider(
-                        id='slider',
-                        min=2010,
-                        max=2022,
-                        value=2022,
-                        marks={
-                            2010: {'label': '2010', 'style': {'color': 'white'}}, 2011: {'label': '2011', 'style': {'color': 'white'}}, 2012: {'label': '2012', 'style': {'color': 'white'}},
-                            2013: {'label': '2013', 'style': {'color': 'white'}}, 2014: {'label': '2014', 'style': {'color': 'white'}}, 2015: {'label': '2015', 'style': {'color': 'white'}},
-                            2016: {'label': '2016', 'style': {'color': 'white'}}, 2017: {'label': '2017', 'style': {'color': 'white'}},
-                            2018: {'label': '2018', 'style': {'color': 'white'}}, 2019: {'label': '2019', 'style': {'color': 'white'}}, 2020: {'label': '2020', 'style': {'color': 'white'}},
-                            2021: {'label': '2021', 'style': {'color': 'white'}}, 2022: {'label': '2022', 'style': {'color': 'white'}}
-                        }
-                    )
-                ])
-            ], className='inline'),
-    ], className='filter_container'),
-        dcc.Graph(id='scatterplot', figure={}),
-    html.Div([
-        dcc.Graph(id='barplot', figure={})
-    ])
-], className='content')
-
-@app.callback(Output('scatterplot', 'figure'),
-              [Input('page-1-dropdown', 'value')],
-              Input('tsunami_alert', 'value'),
-              Input('slider', 'value')
-              )
-def scatter_out(value1, value2, value3):
-    if value1 == 'all':
-        if value2 == 'default':
-                fig = px.scatter(df2, x = 'time', y = 'magnitude', color='alert', size='cdi', color_discrete_sequence=['green', '#d6c800', '#fa9602', 'red'], hover_name='location')
-                fig.update_layout(yaxis_range=[0,9], xaxis_range=[dt.datetime(2009,10,1), dt.datetime(value3, 3 if value3 == 2022 else 12, 30)])
-                return fig
-        else:
-            temp = df2[df2.tsunami == value2]
-            fig = px.scatter(temp, x = 'time', y = 'magnitude', color='alert', size='cdi', color_discrete_sequence=['green', '#d6c800', '#fa9602', 'red'], hover_name='location')
-            fig.update_layout(yaxis_range=[0,9], xaxis_range=[dt.datetime(2009,10,1), dt.datetime(2022, 4, 1)])
-            return fig
-    else:
-        if value2 == 'default':
-            temp = df2[df2.alert == value1]
-            fig = px.scatter(temp, x = 'time', y = 'magnitude', color='alert', size='cdi', color_discrete_sequence=[value1], hover_name='location')
-            fig.update_layout(yaxis_range=[0,9], xaxis_range=[dt.datetime(2009,10,1), dt.datetime(2022, 4, 1)])
-            return fig
-        else:
-            temp = df2[(df2.alert == value1) & (df2.tsunami == value2)]
-            fig = px.scatter(temp, x = 'time', y = 'magnitude', color='alert', size='cdi', color_discrete_sequence=[value1], hover_name='location')
-            fig.update_layout(yaxis_range=[0,9], xaxis_range=[dt.datetime(2009,10,1), dt.datetime(2022, 4, 1)])
-            return fig
-
-
-@app.callback(Output('barplot', 'figure'),
-              [Input('page-1-dropdown', 'value')],
-              Input('tsunami_alert', 'value'),
-              Input('slider', 'value')
-              )
-def barplot_out(value1, value2, value3):
-    if value1 == 'all':
-        if value2 == 'default':
-            df2_temp = df2.time.dt.year.value_counts().reset_index()
-            fig = px.bar(df2_temp, x = 'index', y = 'time', labels={'x': 'Year', 'y': 'number of earthquakes'}, title='Amount of earthquakes registered by year')
-            fig.update_layout(xaxis_range=[2009, value3])
-            return fig
-        else:
-            temp = df2[df2.tsunami == value2]
-            df2_temp = temp.time.dt.year.value_counts().reset_index()
-            fig = px.bar(df2_temp, x = 'index', y = 'time', labels={'x': 'Year', 'y': 'number of earthquakes'}, title='Amount of earthquakes registered by year')
-            fig.update_layout(xaxis_range=[2009, value3])
-            return fig
-    else:
-        if value2 == 'default':
-            temp = df2[df2.alert == value1]
-            df2_temp = temp.time.dt.year.value_counts().reset_index()
-            fig = px.bar(df2_temp, x = 'index', y = 'time', labels={'x': 'Year', 'y': 'number of earthquakes'}, title='Amount of earthquakes registered by year')
-            fig.update_layout(xaxis_range=[2009, value3])
-            return fig
-        else:
-            temp = df2[(df2.alert == value1) & (df2.tsunami == value2)]
-            df2_temp = temp.time.dt.year.value_counts().reset_index()
-            fig = px.bar(df2_temp, x = 'index', y = 'time', labels={'x': 'Year', 'y': 'number of earthquakes'}, title='Amount of earthquakes registered by year')
-            fig.update_layout(xaxis_range=[2009, value3])
-            return fig
+                html.P('Data Source: '),
+                html.A('USGS', href='https://earthquake.usgs.gov/fdsnws/event/1/?ref=springboard', target='_blank')
+            ], className='source')
+        ])
+    ], className='content_container')
 
 
+app.layout = serve_layout
 
-#####################################Second Page######################################### 
-second_page_layout = html.Div([
-        html.H1('Earthquakes from 2010 to 2021'),
-    html.Div([
-        html.Div(html.Label([
-            'Select an alert to filter the first plot:',
-           dcc.Dropdown(
-            id='page-2-dropdown', value='all', clearable=False,
+
+if CLIENTSIDE_FILTERING:
+    @app.callback(Output('events-data', 'data'), Output('events-version', 'data'),
+                  Input('url', 'pathname'), State('events-version', 'data'))
+    @registry.callback
+    def events_data(pathname, version):
+        snapshot = events_snapshot()
+        if snapshot['version'] == version:
+            raise PreventUpdate
+        return snapshot, snapshot['version']
+
+
+def default_layout():
+    return html.Div([
+        html.Div([
+            html.H2('PLEASE SELECT A PAGE'),
+            html.Img(src='https://media0.giphy.com/media/xT1R9JFTKhIpOYBvos/giphy.gif?cid=790b761186ce2b415be65a3c705bea87481b3dad7a3b6985&rid=giphy.gif&ct=g')
+        ], className='default_container')
+    ], className='default_layout')
+
+##################################### First Page ######################################### 
+def year_marks(first, last):
+    step = -(-(last - first + 1) // 13)
+    return {year: {'label': str(year), 'style': {'color': 'white'}} for year in range(first, last + 1, step)}
+
+
+# Dates of the window of the store, as the picker shows them
+DEFAULT_DATES = (store.starttime, data.last_day(store.endtime))
+
+
+# The date window is served by the server callbacks only, the clientside filters
+# work on the snapshot of the store
+def window_picker():
+    if CLIENTSIDE_FILTERING:
+        return []
+    return [
+        html.Div([
+            html.Label([
+                'Dates:',
+                dcc.DatePickerRange(
+                    id='window',
+                    start_date=DEFAULT_DATES[0],
+                    end_date=DEFAULT_DATES[1],
+                    min_date_allowed=data.EARLIEST,
+                    max_date_allowed=dt.date.today().isoformat(),
+                    display_format='YYYY-MM-DD'
+                )
+            ]),
+            html.Div(id='backfill-status')
+        ], className='inline'),
+        dcc.Interval(id='backfill', interval=2000, disabled=True)
+    ]
+
+
+def first_page_layout():
+    # The years of the store, up to the current one when the sync keeps the window open
+    first, last = data.window_years(store.starttime, store.endtime)
+    return html.Div([
+            html.H1('Earthquakes from 2010 to 2021'),
+        html.Div([
+            html.Div(html.Label([
+                'Select an alert to filter:',
+                dcc.Dropdown(
+                id='page-1-dropdown', value='all', clearable=False,
                 options=[
                     {'label': 'Green', 'value': 'green'}, 
                     {'label': 'Yellow', 'value' : 'yellow'},
                     {'label': 'Orange', 'value': 'orange'},
                     {'label': 'Red', 'value': 'red'},
-                    {'label': 'All', 'value': 'all'}
-                ]
-            )],
-            className='filter_text'), className='inline'),
-            html.Div([
-                html.Label([
-                    'Select an alert to filter the second plot:',
-                    dcc.RadioItems(
-                        id='page-2-dropdown_strip', value='all',
-                        options=[
-                            {'label': 'Green', 'value': 'green'}, 
-                            {'label': 'Yellow', 'value' : 'yellow'},
-                            {'label': 'Orange', 'value': 'orange'},
-                            {'label': 'Red', 'value': 'red'},
-                            {'label': 'All', 'value': 'all'}
-                        ]
-                    )
-                ])
-            ], className='inline'),
-            html.Div([
-                html.Label([
-                    'Sig factor (how significant the event is):',
-                    dcc.Slider(
-                        id='strip_slider',
-                        value=0,
-                        min = 0,
-                        max = 2910,
-                        updatemode = 'drag',
-                        marks={0: {'label': '0', 'style': {'color': 'white'}},
-                            100: {'label': '100', 'style': {'color': 'white'}}, 300: {'label': '300', 'style': {'color': 'white'}}, 500: {'label': '500', 'style': {'color': 'white'}},
-                            700: {'label': '700', 'style': {'color': 'white'}}, 900: {'label': '900', 'style': {'color': 'white'}}, 1100: {'label': '1100', 'style': {'color': 'white'}},
-                            1300: {'label': '1300', 'style': {'color': 'white'}}, 1500: {'label': '1500', 'style': {'color': 'white'}}, 1700: {'label': '1700', 'style': {'color': 'white'}},
-                            1900: {'label': '1900', 'style': {'color': 'white'}}, 2100: {'label': '2100', 'style': {'color': 'white'}}, 2300: {'label': '2300', 'style': {'color': 'white'}},
-                            2500: {'label': '2500', 'style': {'color': 'white'}}, 2700: {'label': '2700', 'style': {'color': 'white'}}, 2910: {'label': '2910', 'style': {'color': 'white'}},
-                        }
-                    )
+                    {'label': 'All', 'value': 'all'}]
+                )], className='filter_text'), className='inline'),
+                html.Div([
+                    html.Label([
+                        'Tsunami alert:',
+                        dcc.RadioItems(
+                            id='tsunami_alert',
+                            value='default',
+                            options=[
+                                {'label': 'Default', 'value': 'default'},
+                                {'label': 'Yes', 'value': 0},
+                                {'label': 'No', 'value': 1}
+                            ]
+                        )
+                    ])
+                ], className='inline'),
+                html.Div([
+                    html.Label([
+                        'Select a year to filter:',
+                        dcc.Slider(
+                            id='slider',
+                            min=first,
+                            max=last,
+                            value=last,
+                            marks=year_marks(first, last)
+                        )
+                    ])
+                ], className='inline'),
+        ] + window_picker(), className='filter_container'),
+            dcc.Graph(id='scatterplot', figure={}),
+            dcc.Store(id='scatterplot-view'),
+        html.Div([
+            dcc.Graph(id='barplot', figure={})
+        ])
+    ], className='content')
+
+
+# [start, end) of the date window of page 1, None for the window of the store
+def page_window(start_date, end_date):
+    if start_date is None or (start_date, end_date) == DEFAULT_DATES:
+        return None
+    return query.date_window(start_date, end_date, data.EARLIEST)
+
+
+# Index of the date window of page 1. The figures take its version as an argument,
+# so the figure cache keeps one entry per window and per set of months loaded
+def page_index(start_date, end_date):
+    window = page_window(start_date, end_date)
+    if window is None:
+        return store.wait()
+    return partitions.window(*window)[0]
+
+
+def scatter_out(value1, value2, value3, relayout, start_date=None, end_date=None, ticks=None):
+    version = page_index(start_date, end_date).version
+    return scatter_figure(value1, value2, value3, query.axis_view(relayout), start_date, end_date, version)
+
+
+@figures.memoize
+def scatter_figure(value1, value2, value3, view, start_date, end_date, version):
+    index = page_index(start_date, end_date)
+    with registry.stage('filter'):
+        found, total = index.sample_series(value1, value2, (None, value3), view, POINT_BUDGET)
+    return plots.decimated(plots.scatter(index.df.iloc[found], value1, value3, page_window(start_date, end_date)),
+                           len(found), total)
+
+
+# The date window and the months still being fetched for it. The interval polls while some are
+# missing, the figures below take its ticks as an input to grow with the months that came in
+WINDOW = [] if CLIENTSIDE_FILTERING else [Input('window', 'start_date'), Input('window', 'end_date'),
+                                          Input('backfill', 'n_intervals')]
+
+
+if CLIENTSIDE_FILTERING:
+    app.clientside_callback(
+        ClientsideFunction(namespace='filters', function_name='scatter'),
+        Output('scatterplot', 'figure'),
+        Input('events-data', 'data'),
+        Input('page-1-dropdown', 'value'),
+        Input('tsunami_alert', 'value'),
+        Input('slider', 'value')
+    )
+else:
+    app.callback(Output('scatterplot', 'figure'),
+                 [Input('page-1-dropdown', 'value')],
+                 Input('tsunami_alert', 'value'),
+                 Input('slider', 'value'),
+                 Input('scatterplot-view', 'data'),
+                 *WINDOW
+                 )(registry.callback(scatter_out))
+
+
+def barplot_out(value1, value2, value3, start_date=None, end_date=None, ticks=None):
+    version = page_index(start_date, end_date).version
+    return bar_figure(value1, value2, value3, start_date, end_date, version)
+
+
+@figures.memoize
+def bar_figure(value1, value2, value3, start_date, end_date, version):
+    # Yearly counts are precomputed for every alert and tsunami filter
+    with registry.stage('filter'):
+        years, counts = page_index(start_date, end_date).year_counts[value1, value2]
+    window = page_window(start_date, end_date)
+    fig = plots.figure([dict(type = 'bar', x = years, y = counts, hovertemplate='Year=%{x}<br>number of earthquakes=%{y}<extra></extra>')])
+    fig.update_layout(title_text='Amount of earthquakes registered by year', xaxis_title_text='Year', yaxis_title_text='number of earthquakes')
+    first, _ = data.window_years(store.starttime, store.endtime) if window is None else data.window_years(*window)
+    fig.update_layout(xaxis_range=[first - 1, value3])
+    return fig
+
+
+app.callback(Output('barplot', 'figure'),
+             [Input('page-1-dropdown', 'value')],
+             Input('tsunami_alert', 'value'),
+             Input('slider', 'value'),
+             *WINDOW
+             )(registry.callback(barplot_out))
+
+
+if not CLIENTSIDE_FILTERING:
+    # The slider goes over the years of the window, the layout has the ones of the store
+    @app.callback(Output('slider', 'min'), Output('slider', 'max'), Output('slider', 'marks'), Output('slider', 'value'),
+                  Input('window', 'start_date'), Input('window', 'end_date'), prevent_initial_call=True)
+    def slider_out(start_date, end_date):
+        window = page_window(start_date, end_date)
+        if window is None:
+            first, last = data.window_years(store.starttime, store.endtime)
+        else:
+            first, last = data.window_years(*window)
+        return first, last, year_marks(first, last), last
+
+    @app.callback(Output('backfill', 'disabled'), Output('backfill-status', 'children'),
+                  Input('window', 'start_date'), Input('window', 'end_date'), Input('backfill', 'n_intervals'))
+    @registry.callback
+    def backfill_out(start_date, end_date, ticks):
+        window = page_window(start_date, end_date)
+        if window is None:
+            return True, ''
+        index, found, wanted = partitions.window(*window)
+        if found < wanted:
+            return False, '{:,} earthquakes so far, {} of {} months loaded from USGS'.format(len(index.df), found, wanted)
+        return True, '{:,} earthquakes'.format(len(index.df))
+
+
+
+#####################################Second Page######################################### 
+def second_page_layout():
+    return html.Div([
+            html.H1('Earthquakes from 2010 to 2021'),
+        html.Div([
+            html.Div(html.Label([
+                'Select an alert to filter the first plot:',
+               dcc.Dropdown(
+                id='page-2-dropdown', value='all', clearable=False,
+                    options=[
+                        {'label': 'Green', 'value': 'green'}, 
+                        {'label': 'Yellow', 'value' : 'yellow'},
+                        {'label': 'Orange', 'value': 'orange'},
+                        {'label': 'Red', 'value': 'red'},
+                        {'label': 'All', 'value': 'all'}
+                    ]
+                )],
+                className='filter_text'), className='inline'),
+                html.Div([
+                    html.Label([
+                        'Select an alert to filter the second plot:',
+                        dcc.RadioItems(
+                            id='page-2-dropdown_strip', value='all',
+                            options=[
+                                {'label': 'Green', 'value': 'green'}, 
+                                {'label': 'Yellow', 'value' : 'yellow'},
+                                {'label': 'Orange', 'value': 'orange'},
+                                {'label': 'Red', 'value': 'red'},
+                                {'label': 'All', 'value': 'all'}
+                            ]
+                        )
+                    ])
+                ], className='inline'),
+                html.Div([
+                    html.Label([
+                        'Sig factor (how significant the event is):',
+                        dcc.Slider(
+                            id='strip_slider',
+                            value=0,
+                            min = 0,
+                            max = 2910,
+                            updatemode = 'drag',
+                            marks={0: {'label': '0', 'style': {'color': 'white'}},
+                                100: {'label': '100', 'style': {'color': 'white'}}, 300: {'label': '300', 'style': {'color': 'white'}}, 500: {'label': '500', 'style': {'color': 'white'}},
+                                700: {'label': '700', 'style': {'color': 'white'}}, 900: {'label': '900', 'style': {'color': 'white'}}, 1100: {'label': '1100', 'style': {'color': 'white'}},
+                                1300: {'label': '1300', 'style': {'color': 'white'}}, 1500: {'label': '1500', 'style': {'color': 'white'}}, 1700: {'label': '1700', 'style': {'color': 'white'}},
+                                1900: {'label': '1900', 'style': {'color': 'white'}}, 2100: {'label': '2100', 'style': {'color': 'white'}}, 2300: {'label': '2300', 'style': {'color': 'white'}},
+                                2500: {'label': '2500', 'style': {'color': 'white'}}, 2700: {'label': '2700', 'style': {'color': 'white'}}, 2910: {'label': '2910', 'style': {'color': 'white'}},
+                            }
+                        )
+                    ])
                 ])
-            ])
-     ], className='filter_container'),
-        dcc.Graph(id='boxplot', figure={}),
-    html.Div([
-        dcc.Graph(id='stripplot', figure={})
-    ]),
-    html.Div([
-        html.A('Nuclear Explosion?', id='notice', href='https://www.bbc.com/mundo/noticias-internacional-42309219', target='_blank')
-    ], className='notice_container')
-], className='content')
+         ], className='filter_container'),
+            dcc.Graph(id='boxplot', figure={}),
+        html.Div([
+            dcc.Graph(id='stripplot', figure={}),
+            dcc.Store(id='strip-data')
+        ]),
+        html.Div([
+            html.A('Nuclear Explosion?', id='notice', href='https://www.bbc.com/mundo/noticias-internacional-42309219', target='_blank')
+        ], className='notice_container')
+    ], className='content')
 
 
 @app.callback(
     Output(component_id='boxplot', component_property='figure'),
     [Input(component_id='page-2-dropdown', component_property='value')]
 )
+@registry.callback
+@figures.memoize
 def boxplot_out(value):
-    if value == 'all':
-        box =px.box(df2, x = 'alert', y = 'magnitude', color='alert', color_discrete_sequence=['green', '#d6c800', '#fa9602', 'red'], height=600)
-        return box
-    else:
-        temp = df2[df2.alert == value]
-        box = px.box(temp, x = 'alert', y = 'magnitude', color='alert', color_discrete_sequence=[str(value)], height=600)
-        return box
-
+    # Quartiles, whiskers and outliers are precomputed, the browser doesn't get every magnitude
+    colors = dict(zip(data.ALERTS, ['green', '#d6c800', '#fa9602', 'red']))
+    alerts = data.ALERTS if value == 'all' else [value]
+    traces = []
+    with registry.stage('filter'):
+        boxes = {alert: store.index.boxes.get(alert) for alert in alerts}
+    for alert in alerts:
+        stats = boxes[alert]
+        if stats is None:
+            continue
+        color = colors[alert] if value == 'all' else alert
+        traces.append(dict(type='box', name=alert, x=[alert], q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                           lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                           marker=dict(color=color), legendgroup=alert))
+        traces.append(dict(type='scatter', x=[alert] * len(stats['outliers']), y=stats['outliers'], mode='markers',
+                           marker=dict(color=color), legendgroup=alert, showlegend=False,
+                           hovertemplate='alert=%{x}<br>magnitude=%{y}<extra></extra>'))
+    box = plots.figure(traces)
+    box.update_layout(xaxis_title_text='alert', yaxis_title_text='magnitude', legend_title_text='alert', boxmode='overlay', height=600)
+    return box
+
+# The strip plot rows of the selected alert are sent once, sorted by sig. Moving the slider
+# filters them in the browser (assets/strip.js), a drag doesn't send any request
 @app.callback(
-    Output(component_id='stripplot', component_property='figure'),
-    [Input(component_id='page-2-dropdown_strip', component_property='value')],
-    Input('strip_slider','value')
+    Output(component_id='strip-data', component_property='data'),
+    [Input(component_id='page-2-dropdown_strip', component_property='value')]
+)
+@registry.callback
+@figures.memoize
+def strip_data_out(drop):
+    df2 = store.index.df
+    with registry.stage('filter'):
+        rows = store.index.cells[drop, 'default'].by_sig
+    layout = go.Figure().update_layout(xaxis_title='type', yaxis_title='magnitude', legend_title='type',
+                                       legend_tracegroupgap=0, margin_t=60, boxmode='overlay', height=530,
+                                       yaxis_range=[0,9])
+    return {
+        'sig': df2.sig.to_numpy()[rows],
+        'magnitude': df2.magnitude.to_numpy()[rows].astype(float).round(2),
+        'type': df2.type.cat.codes.to_numpy()[rows],
+        'types': list(df2.type.cat.categories),
+        'layout': layout.to_dict()['layout']
+    }
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='strip', function_name='figure'),
+    Output('stripplot', 'figure'),
+    Input('strip-data', 'data'),
+    Input('strip_slider', 'value')
 )
-def strip_out(drop,slider):
-    if drop == 'all':
-        if slider == 0:
-            fig = px.strip(df2, x = 'type', y = 'magnitude', color='type', height=530)
-            fig.update_traces(marker=dict(size=12, line= dict(width=2, color='DarkSlateGrey')))
-            fig.update_layout(yaxis_range=[0,9])
-            return fig
-        else:
-            temp = df2[df2.sig <= slider]
-            fig = px.strip(temp, x = 'type', y = 'magnitude', color='type', height=530)
-            fig.update_traces(marker=dict(size=12, line= dict(width=2, color='DarkSlateGrey')))
-            fig.update_layout(yaxis_range=[0,9])
-            return fig
-    else:
-        if slider == 0:  
-            temp = df2[df2.alert == drop]
-            fig = px.strip(temp, x = 'type', y = 'magnitude', color='type', height=530)
-            fig.update_traces(marker=dict(size=12, line= dict(width=2, color='DarkSlateGrey')))
-            fig.update_layout(yaxis_range=[0,9])
-            return fig
-        else:
-            temp = df2[(df2.alert == drop) & (df2.sig <= slider)]
-            fig = px.strip(temp, x = 'type', y = 'magnitude', color='type', height=530)
-            fig.update_traces(marker=dict(size=12, line= dict(width=2, color='DarkSlateGrey')))
-            fig.update_layout(yaxis_range=[0,9])
-            return fig
 
 
 #####################################Third Page######################################### 
-third_page_layout = html.Div([
-        html.H1('Earthquake Map'),
-        html.Div([
+def third_page_layout():
+    return html.Div([
+            html.H1('Earthquake Map'),
+            html.Div([
+                html.Label([
+                    'Select an alert to filter:',
+                    dcc.RadioItems(
+                    id='page-3-radios',
+                    options=[
+                        {'label': 'Green', 'value': 'green'}, 
+                        {'label': 'Yellow', 'value' : 'yellow'},
+                        {'label': 'Orange', 'value': 'orange'},
+                        {'label': 'Red', 'value': 'red'},
+                        {'label': 'All', 'value': 'all'}],
+                    value='all'
+            )
+            ]),
             html.Label([
-                'Select an alert to filter:',
-                dcc.RadioItems(
-                id='page-3-radios',
-                options=[
-                    {'label': 'Green', 'value': 'green'}, 
-                    {'label': 'Yellow', 'value' : 'yellow'},
-                    {'label': 'Orange', 'value': 'orange'},
-                    {'label': 'Red', 'value': 'red'},
-                    {'label': 'All', 'value': 'all'}],
-                value='all'
-        )
-        ]),
-        html.Label([
-                'Filter by Tsunami:',
-                dcc.RadioItems(
-                id='tsunami',
-                options=[
-                            {'label': 'Default', 'value': 'default'},
-                            {'label': 'Yes', 'value': 0},
-                            {'label': 'No', 'value': 1}
-                        ],
-                value='default'
-        )
+                    'Filter by Tsunami:',
+                    dcc.RadioItems(
+                    id='tsunami',
+                    options=[
+                                {'label': 'Default', 'value': 'default'},
+                                {'label': 'Yes', 'value': 0},
+                                {'label': 'No', 'value': 1}
+                            ],
+                    value='default'
+            )
+            ])
+            ], className='filter_container'),
+            dcc.Graph(id='page-3-content', figure={}),
+            dcc.Store(id='page-3-content-view'),
+        html.Div([
+            dcc.Graph(id='page-3-content-2', figure={}),
+            dcc.Store(id='page-3-content-2-view')
         ])
-        ], className='filter_container'),
-        dcc.Graph(id='page-3-content', figure={}),
-    html.Div([
-        dcc.Graph(id='page-3-content-2', figure={})
-    ])
-], className='content')
+    ], className='content')
 
-@app.callback(Output('page-3-content', 'figure'),
-              [Input('page-3-radios', 'value')],
-              Input('tsunami', 'value')
-                )
-def page_3_radios(value1, value2):
-    if value1 == 'all':
-        if value2 == 'default':
-            return px.density_mapbox(df2, lat='longitud', lon='latitud', z='magnitude', radius=5,
-                            center=dict(lat=7, lon=37), zoom=0.5,
-                            mapbox_style="stamen-terrain", hover_name='location')
-        else:
-            temp = df2[df2.tsunami == value2]
-            return px.density_mapbox(temp, lat='longitud', lon='latitud', z='magnitude', radius=7,
-                            center=dict(lat=7, lon=37), zoom=0.5,
-                            mapbox_style="stamen-terrain", hover_name='location')
-    else:
-        if value2 == 'default':
-            temp = temp = df2[df2.alert == value1]
-            return px.density_mapbox(temp, lat='longitud', lon='latitud', z='magnitude', radius=7,
-                            center=dict(lat=7, lon=37), zoom=0.5,
-                            mapbox_style="stamen-terrain", hover_name='location')
-        else:
-            temp = temp = df2[(df2.alert == value1) & (df2.tsunami == value2)]
-            return px.density_mapbox(temp, lat='longitud', lon='latitud', z='magnitude', radius=7,
-                            center=dict(lat=7, lon=37), zoom=0.5,
-                            mapbox_style="stamen-terrain", hover_name='location')
-
-@app.callback(Output('page-3-content-2', 'figure'),
-              [Input('page-3-radios', 'value')],
-              Input('tsunami', 'value')
-              )
-def page_3_second(value1, value2):
-    if value1 == 'all':
-        if value2 == 'default':
-            fig = go.Figure(data=go.Scattergeo(
-                lon = df2.latitud,
-                lat = df2.longitud,
-                text = df2.location,
-                mode = 'markers',
-                marker_color = df2.alert,
-                ))
-            fig.update_layout(
-                autosize=False,
-                margin=dict(
-                    l=0,
-                    r=0,
-                    b=0,
-                    t=0,
-                    pad=90
-                )
-            )
-            return fig
-        else:
-            temp = df2[df2.tsunami == value2]
-            fig = go.Figure(data=go.Scattergeo(
-                lon = temp.latitud,
-                lat = temp.longitud,
-                text = temp.location,
-                mode = 'markers',
-                marker_color = temp.alert
-                ))
-            return fig
-    else:
-        if value2 == 'default':
-            temp = df2[df2.alert == value1]
-            fig = go.Figure(data=go.Scattergeo(
-                lon = temp.latitud,
-                lat = temp.longitud,
-                text = temp.location,
-                mode = 'markers',
-                marker_color = temp.alert
-                ))
-            return fig
-        else:
-            temp = df2[(df2.alert == value1) & (df2.tsunami == value2)]
-            fig = go.Figure(data=go.Scattergeo(
-                lon = temp.latitud,
-                lat = temp.longitud,
-                text = temp.location,
-                mode = 'markers',
-                marker_color = temp.alert
-                ))
-            return fig
-
-
-# Update the index
+
+# The map gets the events binned on a grid that follows its zoom, only the cells in view
+def page_3_radios(value1, value2, relayout):
+    level, bounds = query.map_view(relayout)
+    return density_map(value1, value2, level, bounds)
+
+
+@figures.memoize
+def density_map(value1, value2, level, bounds):
+    with registry.stage('filter'):
+        cells = store.index.density(value1, value2, level, bounds)
+    return plots.density_cells(cells, value1, value2)
+
+
+def page_3_second(value1, value2, relayout):
+    return geo_figure(value1, value2, query.geo_view(relayout))
+
+
+@figures.memoize
+def geo_figure(value1, value2, bounds):
+    index = store.index
+    with registry.stage('filter'):
+        found, total = index.sample_map(value1, value2, bounds, POINT_BUDGET)
+    return plots.decimated(plots.geo(index.df.iloc[found]), len(found), total)
+
+
+if CLIENTSIDE_FILTERING:
+    for output, function in [('page-3-content', 'density'), ('page-3-content-2', 'geo')]:
+        app.clientside_callback(
+            ClientsideFunction(namespace='filters', function_name=function),
+            Output(output, 'figure'),
+            Input('events-data', 'data'),
+            Input('page-3-radios', 'value'),
+            Input('tsunami', 'value')
+        )
+else:
+    app.callback(Output('page-3-content', 'figure'),
+                 [Input('page-3-radios', 'value')],
+                 Input('tsunami', 'value'),
+                 Input('page-3-content-view', 'data')
+                 )(registry.callback(page_3_radios))
+    app.callback(Output('page-3-content-2', 'figure'),
+                 [Input('page-3-radios', 'value')],
+                 Input('tsunami', 'value'),
+                 Input('page-3-content-2-view', 'data')
+                 )(registry.callback(page_3_second))
+
+
+# plotly.js sends only the keys of the view that changed. Each graph keeps all of them merged
+# in its -view store (assets/view.js), the server callbacks above read the view from there
+for graph in ['scatterplot', 'page-3-content', 'page-3-content-2']:
+    app.clientside_callback(
+        ClientsideFunction(namespace='view', function_name='merge'),
+        Output(graph + '-view', 'data'),
+        Input(graph, 'relayoutData'),
+        State(graph + '-view', 'data')
+    )
+
+
+# Update the index, pages are built when they are asked for
 @app.callback(dash.dependencies.Output('page-content', 'children'),
               [dash.dependencies.Input('url', 'pathname')])
+@registry.callback
 def display_page(pathname):
     if pathname == '/page-1':
-        return first_page_layout
+        return first_page_layout()
     elif pathname == '/page-2':
-        return second_page_layout
+        return second_page_layout()
     elif pathname == '/page-3':
-        return third_page_layout
+        return third_page_layout()
     else:
-        return default_layout
+        return default_layout()
     # You could also return a 404 "URL not found" page here
 
 
@@ -0,0 +1,154 @@
+// Alert and tsunami filters of the scatter and the maps, used when CLIENTSIDE_FILTERING is on.
+// The traces and layouts are the ones of scatter(), density() and geo() in plots.py, a change there
+// needs the same change here. Every event is drawn, the server decimates the scatter and the geo
+// plot and bins the density map instead.
+(function() {
+    var decoded = {version: null};
+
+    function typed(text, Type) {
+        var raw = atob(text);
+        var bytes = new Uint8Array(raw.length);
+        for (var i = 0; i < raw.length; i++) {
+            bytes[i] = raw.charCodeAt(i);
+        }
+        return new Type(bytes.buffer);
+    }
+
+    // The snapshot is decoded once per dataset version
+    function columns(data) {
+        if (decoded.version !== data.version) {
+            decoded = {
+                version: data.version,
+                time: typed(data.time, Float64Array),
+                magnitude: typed(data.magnitude, Float64Array),
+                cdi: typed(data.cdi, Float64Array),
+                latitud: typed(data.latitud, Float64Array),
+                longitud: typed(data.longitud, Float64Array),
+                alert: typed(data.alert, Int8Array),
+                tsunami: typed(data.tsunami, Int8Array),
+                location: data.location
+            };
+        }
+        return decoded;
+    }
+
+    function isoformat(ms) {
+        return new Date(ms).toISOString().slice(0, 19);
+    }
+
+    // Row positions matching the filters, in table order like store.index.query
+    function query(data, alert, tsunami, lastYear) {
+        var table = columns(data);
+        var alertCode = alert === 'all' ? null : data.alerts.indexOf(alert);
+        var tsunamiCode = tsunami === 'default' ? null : data.tsunamis.indexOf(tsunami);
+        var end = lastYear === undefined ? Infinity : Date.UTC(lastYear + 1, 0, 1);
+        var rows = [];
+        for (var i = 0; i < data.rows; i++) {
+            if ((alertCode === null || table.alert[i] === alertCode) &&
+                (tsunamiCode === null || table.tsunami[i] === tsunamiCode) &&
+                table.time[i] < end) {
+                rows.push(i);
+            }
+        }
+        return rows;
+    }
+
+    function pick(values, rows) {
+        return rows.map(function(i) { return values[i]; });
+    }
+
+    function alertColor(data, alert, value) {
+        return value === 'all' ? data.colors[alert] : value;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        filters: {
+            scatter: function(data, value1, value2, value3) {
+                if (!data) {
+                    return window.dash_clientside.no_update;
+                }
+                var table = columns(data);
+                var rows = query(data, value1, value2, value3);
+                var maxCdi = rows.reduce(function(max, i) { return Math.max(max, table.cdi[i]); }, -Infinity);
+                var sizeref = rows.length ? maxCdi / (20 * 20) : 1;
+                var traces = [];
+                data.alerts.forEach(function(alert, code) {
+                    var found = rows.filter(function(i) { return table.alert[i] === code; });
+                    if (!found.length) {
+                        return;
+                    }
+                    traces.push({
+                        type: rows.length > 1000 ? 'scattergl' : 'scatter',
+                        x: pick(table.time, found).map(isoformat),
+                        y: pick(table.magnitude, found),
+                        hovertext: pick(table.location, found),
+                        mode: 'markers', name: alert, legendgroup: alert, showlegend: true,
+                        marker: {color: alertColor(data, alert, value1), size: pick(table.cdi, found),
+                                 sizemode: 'area', sizeref: sizeref, symbol: 'circle'},
+                        hovertemplate: '<b>%{hovertext}</b><br><br>alert=' + alert +
+                                       '<br>time=%{x}<br>magnitude=%{y}<br>cdi=%{marker.size}<extra></extra>'
+                    });
+                });
+                return {
+                    data: traces,
+                    layout: {
+                        template: data.template,
+                        xaxis: {title: {text: 'time'},
+                                range: ['2009-10-01T00:00:00', value3 + (value3 === 2022 ? '-03' : '-12') + '-30T00:00:00']},
+                        yaxis: {title: {text: 'magnitude'}, range: [0, 9]},
+                        legend: {title: {text: 'alert'}, tracegroupgap: 0, itemsizing: 'constant'},
+                        margin: {t: 60},
+                        uirevision: 'scatter'
+                    }
+                };
+            },
+
+            density: function(data, value1, value2) {
+                if (!data) {
+                    return window.dash_clientside.no_update;
+                }
+                var table = columns(data);
+                var rows = query(data, value1, value2);
+                return {
+                    data: [{
+                        type: 'densitymapbox',
+                        lat: pick(table.longitud, rows), lon: pick(table.latitud, rows), z: pick(table.magnitude, rows),
+                        radius: value1 === 'all' && value2 === 'default' ? 5 : 7,
+                        hovertext: pick(table.location, rows), name: '', coloraxis: 'coloraxis',
+                        hovertemplate: '<b>%{hovertext}</b><br><br>magnitude=%{z}<br>longitud=%{lat}<br>latitud=%{lon}<extra></extra>'
+                    }],
+                    layout: {
+                        template: data.template,
+                        mapbox: {center: {lat: 7, lon: 37}, zoom: 0.5, style: 'stamen-terrain'},
+                        coloraxis: {colorbar: {title: {text: 'magnitude'}},
+                                    colorscale: data.template.layout.colorscale.sequential},
+                        legend: {tracegroupgap: 0},
+                        margin: {t: 60}
+                    }
+                };
+            },
+
+            geo: function(data, value1, value2) {
+                if (!data) {
+                    return window.dash_clientside.no_update;
+                }
+                var table = columns(data);
+                var rows = query(data, value1, value2);
+                return {
+                    data: [{
+                        type: 'scattergeo',
+                        lon: pick(table.latitud, rows), lat: pick(table.longitud, rows),
+                        text: pick(table.location, rows), mode: 'markers',
+                        marker: {color: rows.map(function(i) { return data.alerts[table.alert[i]]; })}
+                    }],
+                    layout: {
+                        template: data.template,
+                        autosize: false,
+                        margin: {l: 0, r: 0, b: 0, t: 0, pad: 90},
+                        uirevision: 'geo'
+                    }
+                };
+            }
+        }
+    });
+})();
@@ -0,0 +1,56 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    strip: {
+        // Same traces as px.strip(x='type', y='magnitude', color='type') over the rows with sig <= slider.
+        // The rows come sorted by sig, a slider at 0 means no sig filter
+        figure: function(data, slider) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var end = data.sig.length;
+            if (slider) {
+                var low = 0;
+                while (low < end) {
+                    var middle = (low + end) >> 1;
+                    if (data.sig[middle] <= slider) {
+                        low = middle + 1;
+                    } else {
+                        end = middle;
+                    }
+                }
+            }
+            var groups = data.types.map(function() {
+                return [];
+            });
+            for (var i = 0; i < end; i++) {
+                if (data.type[i] >= 0) {
+                    groups[data.type[i]].push(data.magnitude[i]);
+                }
+            }
+            var colorway = data.layout.template.layout.colorway;
+            var traces = [];
+            // The color follows the type, not the traces drawn, so a type keeps it while the slider moves
+            groups.forEach(function(magnitudes, code) {
+                if (!magnitudes.length) {
+                    return;
+                }
+                var name = data.types[code];
+                traces.push({
+                    type: 'box', name: name, legendgroup: name, offsetgroup: name, alignmentgroup: 'True',
+                    x: magnitudes.map(function() { return name; }), y: magnitudes,
+                    boxpoints: 'all', pointpos: 0, hoveron: 'points', orientation: 'v', showlegend: true,
+                    fillcolor: 'rgba(255,255,255,0)', line: {color: 'rgba(255,255,255,0)'},
+                    marker: {color: colorway[code % colorway.length], size: 12,
+                             line: {width: 2, color: 'DarkSlateGrey'}},
+                    hovertemplate: 'type=%{x}<br>magnitude=%{y}<extra></extra>'
+                });
+            });
+            var layout = Object.assign({}, data.layout, {
+                xaxis: Object.assign({}, data.layout.xaxis, {
+                    categoryorder: 'array',
+                    categoryarray: traces.map(function(trace) { return trace.name; })
+                })
+            });
+            return {data: traces, layout: layout};
+        }
+    }
+});
@@ -0,0 +1,29 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    view: {
+        // plotly.js only sends the keys that changed: a pan of the geo plot has no scale, a zoom from
+        // the modebar no center, a drag along one axis no range of the other. The view of a graph is
+        // every relayoutData merged, the server callbacks read it instead of the last event
+        merge: function(relayout, view) {
+            var merged = Object.assign({}, view);
+            var keys = Object.keys(relayout || {});
+            // A reset or a new range of an axis replaces every range key of that axis
+            keys.forEach(function(key) {
+                var axis = key.match(/^(\w+)\.(autorange|range)(\[\d\])?$/);
+                if (axis) {
+                    ['.range', '.range[0]', '.range[1]'].forEach(function(suffix) {
+                        delete merged[axis[1] + suffix];
+                    });
+                }
+            });
+            keys.forEach(function(key) {
+                if (!/\.autorange$/.test(key)) {
+                    merged[key] = relayout[key];
+                }
+            });
+            if (view && JSON.stringify(merged) === JSON.stringify(view)) {
+                return window.dash_clientside.no_update;
+            }
+            return merged;
+        }
+    }
+});
@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so every import is paid again, like a new gunicorn worker.
+# A tree without /ready is ready once app.py is imported
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+imported = time.perf_counter() - start
+client = app.server.test_client()
+while client.get('/ready').status_code == 503:
+    time.sleep(0.01)
+ready = time.perf_counter() - start
+print(json.dumps({'imported': imported, 'ready': ready}))
+'''
+
+
+def boot(root, env):
+    result = subprocess.run([sys.executable, '-c', PROBE, root], env=env, cwd=root,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time from the import of app.py to a worker ready to serve')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every request')
+    parser.add_argument('--per-event', type=float, default=0.001, help='seconds added for each event returned')
+    parser.add_argument('--root', default=ROOT,
+                        help='tree of the app to boot, a checkout of an older commit to compare against')
+    args = parser.parse_args(argv)
+
+    server = FakeUSGS(synthetic.catalog(args.events), latency=args.latency,
+                      per_event=args.per_event).start()
+    env = dict(os.environ, USGS_URL=server.url, CACHE_DIR=tempfile.mkdtemp(prefix='earthquake-cache-'))
+
+    print('{:>6} {:>10} {:>10}'.format('cache', 'imported', 'ready'))
+    for cache in ['cold', 'warm']:
+        times = boot(os.path.abspath(args.root), env)
+        print('{:>6} {:>9.2f}s {:>9.2f}s'.format(cache, times['imported'], times['ready']))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import sys
+import time
+import argparse
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import plots
+import query
+from benchmarks.density import make_index
+
+
+# The scatter zoomed on 2015 and magnitudes 4 to 6, the geo plot zoomed on Japan
+VIEWS = {
+    'scatter': {'xaxis.range[0]': '2015-01-01 00:00:00', 'xaxis.range[1]': '2015-12-31 23:59:59',
+                'yaxis.range[0]': 4, 'yaxis.range[1]': 6},
+    'geo': {'geo.projection.scale': 8, 'geo.center.lon': 139, 'geo.center.lat': 36}
+}
+
+
+def scatter(index, relayout, budget):
+    found, total = index.sample_series('all', 'default', (None, 2021), query.axis_view(relayout), budget)
+    return plots.decimated(plots.scatter(index.df.iloc[found], 'all', 2021), len(found), total), found
+
+
+def geo(index, relayout, budget):
+    found, total = index.sample_map('all', 'default', query.geo_view(relayout), budget)
+    return plots.decimated(plots.geo(index.df.iloc[found]), len(found), total), found
+
+
+def measure(build, index, relayout, budget):
+    start = time.perf_counter()
+    fig, found = build(index, relayout, budget)
+    text = to_json_plotly(fig)
+    return time.perf_counter() - start, len(text), found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scatter plot responses with and without a point budget')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[7000, 100000, 1000000])
+    parser.add_argument('--budget', type=int, default=4000)
+    parser.add_argument('--everything-max', type=int, default=100000,
+                        help='skip the figures with every point above this size, they take a minute')
+    args = parser.parse_args(argv)
+
+    print('{:>9} {:>8} {:>8} {:>14} {:>9} {:>9} {:>14} {:>9} {:>9}'.format(
+        'events', 'plot', 'view', 'every point', 'time', 'points', 'budget', 'time', 'points'))
+    for n in args.sizes:
+        index = make_index(n)
+        significant = set(np.flatnonzero(index.df.sig.to_numpy() >= query.SIGNIFICANT_SIG))
+        for name, build in [('scatter', scatter), ('geo', geo)]:
+            for view, relayout in [('full', None), ('zoomed', VIEWS[name])]:
+                new, new_size, found = measure(build, index, relayout, args.budget)
+                assert len(found) <= args.budget
+                if n > args.everything_max:
+                    print('{:>9} {:>8} {:>8} {:>14} {:>9} {:>9} {:>14,} {:>8.3f}s {:>9,}'.format(
+                        n, name, view, 'skipped', '-', '-', new_size, new, len(found)))
+                    continue
+                old, old_size, everything = measure(build, index, relayout, n)
+                # Significant events in view are never dropped while they fit in half the budget
+                shown = significant & set(everything)
+                assert len(shown) > args.budget // 2 or shown <= set(found)
+                print('{:>9} {:>8} {:>8} {:>14,} {:>8.3f}s {:>9,} {:>14,} {:>8.3f}s {:>9,}'.format(
+                    n, name, view, old_size, old, len(everything), new_size, new, len(found)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import sys
+import time
+import argparse
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import data
+import plots
+import query
+from benchmarks.ingest import make_catalog, ingest
+
+
+# Map views as the relayoutData of the density map, the world at start and a zoom on Japan
+VIEWS = {
+    'world': None,
+    'zoomed': {'mapbox.center': {'lon': 139, 'lat': 36}, 'mapbox.zoom': 4,
+               'mapbox._derived': {'coordinates': [[130, 42], [148, 42], [148, 30], [130, 30]]}}
+}
+
+
+# Copies of the tiled catalog are moved a little, so a large catalog covers the map like a real one
+def make_index(n, seed=0):
+    df = ingest(make_catalog(n))
+    rng = np.random.default_rng(seed)
+    df['latitud'] = np.clip(df.latitud + rng.normal(0, 0.5, n), -180, 180).astype('float32')
+    df['longitud'] = np.clip(df.longitud + rng.normal(0, 0.5, n), -90, 90).astype('float32')
+    return query.EventIndex(df, data.fingerprint(df))
+
+
+# Every event to the browser, the density map before the binning
+def all_points(index, relayout):
+    return plots.density(index.query('all', 'default'), 'all', 'default')
+
+
+def binned(index, relayout):
+    level, bounds = query.map_view(relayout)
+    return plots.density_cells(index.density('all', 'default', level, bounds), 'all', 'default')
+
+
+# Time to build and serialize the figure, best of repeat, and the size of the response
+def measure(build, index, relayout, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = to_json_plotly(build(index, relayout))
+        times.append(time.perf_counter() - start)
+    return min(times), len(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Density map payload and latency, every event against binned cells')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[7000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print('{:>9} {:>8} {:>14} {:>10} {:>14} {:>10} {:>10}'.format(
+        'events', 'view', 'points bytes', 'points', 'binned bytes', 'binned', 'first'))
+    for n in args.sizes:
+        index = make_index(n)
+        for name, relayout in VIEWS.items():
+            old, old_size = measure(all_points, index, relayout, args.repeat)
+            # The first call at a zoom level builds its grid, the next ones only cut the viewport
+            first, _ = measure(binned, index, relayout, 1)
+            new, new_size = measure(binned, index, relayout, args.repeat)
+            print('{:>9} {:>8} {:>14,} {:>9.3f}s {:>14,} {:>9.3f}s {:>9.3f}s'.format(
+                n, name, old_size, old, new_size, new, first))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import sys
+import json
+import time
+import random
+import bisect
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from benchmarks import synthetic
+
+
+# Local stand-in for the USGS FDSN endpoint serving a synthetic catalog.
+# Every answer waits latency seconds plus per_event seconds for each event returned,
+# and error_rate of the requests get a 429 or a 503. The first failures requests always fail,
+# with a 429 and a 503 in turn
+class FakeUSGS(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, features, port=0, latency=0.0, error_rate=0.0, per_event=0.0, failures=0):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.latency = latency
+        self.per_event = per_event
+        self.error_rate = error_rate
+        self.failures = failures
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.alerts = {}
+        for feature in sorted(features, key=lambda f: f['properties']['time']):
+            self.alerts.setdefault(feature['properties']['alert'], []).append(feature)
+        self.times = {alert: [f['properties']['time'] for f in found] for alert, found in self.alerts.items()}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/fdsnws/event/1/query?'.format(self.server_address[1])
+
+    def query(self, params):
+        alert = params.get('alertlevel')
+        start = to_ms(params.get('starttime'), 0)
+        end = to_ms(params.get('endtime'), float('inf'))
+        updated = to_ms(params.get('updatedafter'), 0)
+        found = []
+        for name in ([alert] if alert else list(self.alerts)):
+            times = self.times.get(name, [])
+            rows = self.alerts.get(name, [])[bisect.bisect_left(times, start):bisect.bisect_right(times, end)]
+            found += [f for f in rows if f['properties']['updated'] >= updated]
+        return synthetic.geojson(found)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def to_ms(value, default):
+    if not value:
+        return default
+    return pd.Timestamp(value).value // 10 ** 6
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            forced = server.requests <= server.failures
+            status = [503, 429][server.requests % 2] if forced else random.choice([429, 503])
+        if forced or random.random() < server.error_rate:
+            with server.lock:
+                server.errors += 1
+            time.sleep(server.latency)
+            self.send_response(status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        found = server.query(params)
+        time.sleep(server.latency + server.per_event * len(found['features']))
+        body = json.dumps(found).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a synthetic USGS catalog on localhost')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--port', type=int, default=8500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--per-event', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    server = FakeUSGS(synthetic.catalog(args.events, args.seed), args.port, args.latency, args.error_rate,
+                      args.per_event)
+    print('Serving {} events on {} (set USGS_URL to use it)'.format(args.events, server.url))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
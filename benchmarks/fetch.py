@@ -0,0 +1,57 @@
+import sys
+import json
+import time
+import argparse
+
+import requests
+
+import data
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+
+
+# The fetch used before the parallel pipeline: one request per alert level, one after another
+def legacy_fetch(url, starttime, endtime):
+    found = {}
+    for alert in data.ALERTS:
+        paramss = {"format": "geojson", "starttime": starttime, "endtime": endtime, "alertlevel": alert}
+        found[alert] = json.loads(requests.get(url, params=paramss).text)
+    return found
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def count(found):
+    return sum(len(result['features']) for result in found.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cold start fetch time, sequential against parallel')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every request')
+    parser.add_argument('--per-event', type=float, default=0.001, help='seconds added for each event returned')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='share of 429/503 answers')
+    args = parser.parse_args(argv)
+
+    server = FakeUSGS(synthetic.catalog(args.events), latency=args.latency,
+                      per_event=args.per_event).start()
+    data.path = server.url
+
+    legacy, found = timed(legacy_fetch, server.url, data.STARTTIME, data.ENDTIME)
+    print('sequential: {:.2f}s, {} requests, {} events'.format(legacy, server.requests, count(found)))
+
+    server.requests = 0
+    server.error_rate = args.error_rate
+    parallel, found = timed(data.fetch, data.STARTTIME, data.ENDTIME)
+    print('parallel:   {:.2f}s, {} requests ({} retried), {} events, {} workers'.format(
+        parallel, server.requests, server.errors, count(found), data.FETCH_WORKERS))
+    print('speedup:    {:.1f}x'.format(legacy / parallel))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import time
+import tempfile
+import threading
+
+from werkzeug.serving import make_server
+
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+
+
+# Imports app.py against a synthetic catalog served by the stand-in USGS endpoint,
+# with its own empty cache folder. env can set any other variable read at import.
+# Returns once the events are loaded
+def load_app(events=7000, seed=0, **env):
+    fake = FakeUSGS(synthetic.catalog(events, seed)).start()
+    os.environ['USGS_URL'] = fake.url
+    os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='earthquake-cache-')
+    os.environ.update({key: str(value) for key, value in env.items()})
+    import app
+    app.store.wait(timeout=None)
+    return app
+
+
+# Runs the Flask server of the app on a free local port, threaded like a gunicorn gthread worker
+class Server:
+    def __init__(self, server):
+        self.http = make_server('127.0.0.1', 0, server, threaded=True)
+        self.url = 'http://127.0.0.1:{}'.format(self.http.server_port)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.http.shutdown()
+
+
+# Body of the request the Dash renderer sends when inputs of a callback change
+def update_body(output, inputs):
+    component, prop = output.split('.')
+    return {
+        'output': output,
+        'outputs': {'id': component, 'property': prop},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': ['{}.{}'.format(*inputs[-1][:2])]
+    }
+
+
+def update(session, url, output, inputs):
+    start = time.perf_counter()
+    response = session.post(url + '/_dash-update-component', json=update_body(output, inputs))
+    response.raise_for_status()
+    return time.perf_counter() - start, len(response.content)
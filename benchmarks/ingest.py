@@ -0,0 +1,70 @@
+import sys
+import time
+import argparse
+import datetime as dt
+
+import pandas as pd
+
+import data
+from benchmarks import synthetic
+
+
+# The ingest used before the vectorized pipeline, kept here to compare against
+def refactor_date(row):
+    actual_value = row['properties.time']
+    actual_time = dt.datetime.fromtimestamp(actual_value // 1000.0)
+    row['properties.time'] = actual_time
+    return row
+
+
+def legacy_ingest(geojson):
+    df = pd.json_normalize(geojson['features'])
+    df = df.apply(refactor_date, axis='columns')
+    df2 = df[['id', 'properties.mag', 'properties.place', 'properties.time', 'properties.detail', \
+    'properties.felt', 'properties.cdi', 'properties.mmi', 'properties.alert', 'properties.tsunami', \
+    'properties.sig', 'properties.net', 'properties.dmin', 'properties.type', 'geometry.coordinates']]
+    df2 = df2.set_axis(['id', 'magnitude', 'location', 'time', 'detail', 'felt', 'cdi', 'mmi', 'alert', 'tsunami', 'sig', 'net', 'dmin', 'type', 'coordinates'], axis=1)
+    df2[['latitud', 'longitud', 'depth']] = pd.DataFrame(df2.coordinates.tolist(), index= df2.index)
+    return data.clean(df2)
+
+
+def ingest(geojson):
+    return data.clean(data.normalize(geojson))
+
+
+# Large catalogs repeat the dicts of a smaller one, the ingest work per event is the same
+def make_catalog(n, unique=20000):
+    features = synthetic.catalog(min(n, unique))
+    return synthetic.geojson((features * (n // len(features) + 1))[:n])
+
+
+def best_of(func, geojson, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(geojson)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest time, row-wise apply against vectorized')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[7000, 100000, 1000000])
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='skip the row-wise ingest above this size, it takes minutes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print('{:>9} {:>12} {:>12} {:>9}'.format('events', 'row-wise', 'vectorized', 'speedup'))
+    for n in args.sizes:
+        geojson = make_catalog(n)
+        new = best_of(ingest, geojson, args.repeat)
+        if n <= args.legacy_max:
+            old = best_of(legacy_ingest, geojson, 1)
+            print('{:>9} {:>11.2f}s {:>11.3f}s {:>8.1f}x'.format(n, old, new, old / new))
+        else:
+            print('{:>9} {:>12} {:>11.3f}s {:>9}'.format(n, 'skipped', new, '-'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import sys
+import argparse
+
+import data
+from benchmarks.ingest import legacy_ingest, ingest, make_catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bytes per column of the event table, old schema against compact')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--dyno-mb', type=int, default=512, help='memory of one dyno')
+    args = parser.parse_args(argv)
+
+    geojson = make_catalog(args.events)
+    old = data.memory_report(legacy_ingest(geojson))
+    new = data.memory_report(ingest(geojson))
+
+    print('{:>12} {:>12} {:>12}'.format('column', 'old bytes', 'new bytes'))
+    for column in old.index.union(new.index, sort=False):
+        print('{:>12} {:>12} {:>12}'.format(column, int(old.get(column, 0)), int(new.get(column, 0))))
+    print('{:>12} {:>12} {:>12}'.format('total', int(old.sum()), int(new.sum())))
+    print('per worker: {:.2f} MB -> {:.2f} MB ({:.1f}x smaller), {} -> {} copies in {} MB'.format(
+        old.sum() / 1e6, new.sum() / 1e6, old.sum() / new.sum(),
+        int(args.dyno_mb * 1e6 // old.sum()), int(args.dyno_mb * 1e6 // new.sum()), args.dyno_mb))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+from benchmarks.harness import update_body
+from benchmarks.suite import CALLBACKS
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One filter combination per callback, the heaviest of each
+CASES = [('scatter_out', ('all', 'default', 2022)), ('scatter_out.zoomed', ('all', 'default', 2022)),
+         ('barplot_out', ('all', 'default', 2022)), ('boxplot_out', ('all',)), ('strip_data_out', ('all',)),
+         ('page_3_radios', ('all', 'default')), ('page_3_second', ('all', 'default'))]
+
+# Runs in a fresh interpreter against the app of the tree in argv[1], so an older checkout
+# is measured with its own figures, encoder and compression. The figure cache is off and every
+# request is sent repeat times per encoding the browser may accept, after one to warm up.
+# Stage times are the means of the metrics registry over those requests
+PROBE = '''
+import sys, json, time, statistics
+sys.path.insert(0, sys.argv[1])
+import app
+client = app.server.test_client()
+while client.get('/ready').status_code == 503:
+    time.sleep(0.01)
+app.figures.max_bytes = 0
+results = {}
+for name, body in json.loads(sys.stdin.read()).items():
+    found = {}
+    client.post('/_dash-update-component', json=body)
+    app.registry.histograms.clear()
+    for encoding in ['identity', 'gzip', 'br']:
+        times = []
+        for _ in range(int(sys.argv[2])):
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json=body, headers={'Accept-Encoding': encoding})
+            times.append(time.perf_counter() - start)
+        found[encoding] = {'seconds': statistics.median(times), 'bytes': len(response.get_data()),
+                           'encoding': response.headers.get('Content-Encoding', 'identity')}
+    found['stages'] = {dict(labels)['stage']: histogram.sum / histogram.count
+                       for (metric, labels), histogram in app.registry.histograms.items()
+                       if metric == 'callback_seconds' and histogram.count}
+    results[name] = found
+print(json.dumps(results))
+'''
+
+
+def probe(root, env, repeat):
+    bodies = {}
+    for name, combination in CASES:
+        output, inputs, _ = CALLBACKS[name]
+        bodies[name] = update_body(output, inputs(*combination))
+    result = subprocess.run([sys.executable, '-c', PROBE, root, str(repeat)], env=env, cwd=root,
+                            input=json.dumps(bodies), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(label, found):
+    print(label)
+    print('{:>20} {:>9} {:>9} {:>10} {:>9} {:>10} {:>10} {:>10}'.format(
+        'callback', 'filter', 'build', 'serialize', 'total', 'raw', 'gzip', 'br'))
+    for name, _ in CASES:
+        result = found[name]
+        stages = result['stages']
+        # Serialization is the encoding in Dash plus the one of the figure cache
+        print('{:>20} {:>7.1f}ms {:>7.1f}ms {:>8.1f}ms {:>7.1f}ms {:>7.1f}KB {:>7.1f}KB {:>7.1f}KB'.format(
+            name, 1000 * stages.get('filter', 0), 1000 * stages.get('build', 0),
+            1000 * (stages.get('serialize', 0) + stages.get('cache', 0)), 1000 * result['identity']['seconds'],
+            result['identity']['bytes'] / 1e3, result['gzip']['bytes'] / 1e3, result['br']['bytes'] / 1e3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and serialization time and bytes on the wire per callback')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--root', default=ROOT, help='tree of the app to measure')
+    parser.add_argument('--baseline', help='checkout of an older commit to measure first')
+    args = parser.parse_args(argv)
+
+    server = FakeUSGS(synthetic.catalog(args.events)).start()
+    for label, root in [('baseline', args.baseline), ('current', args.root)]:
+        if root is None:
+            continue
+        env = dict(os.environ, USGS_URL=server.url, CACHE_DIR=tempfile.mkdtemp(prefix='earthquake-cache-'))
+        report('{} ({})'.format(label, os.path.abspath(root)), probe(os.path.abspath(root), env, args.repeat))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
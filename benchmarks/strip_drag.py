@@ -0,0 +1,67 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+import plotly.express as px
+from dash.dependencies import Input, Output
+
+from benchmarks.harness import load_app, Server, update
+
+
+# The strip plot callback before the slider moved to the browser:
+# with updatemode='drag' every slider position reached during a drag was one request
+def legacy_strip_out(store):
+    def strip_out(drop, slider):
+        temp = store.index.query(drop, sig_max=slider or None)
+        fig = px.strip(temp, x = 'type', y = 'magnitude', color='type', height=530)
+        fig.update_traces(marker=dict(size=12, line= dict(width=2, color='DarkSlateGrey')))
+        fig.update_layout(yaxis_range=[0,9])
+        return fig
+    return strip_out
+
+
+def gesture(url, steps, legacy):
+    session = requests.Session()
+    if legacy:
+        positions = np.linspace(0, 2910, steps).astype(int).tolist()
+        return [update(session, url, 'stripplot-legacy.figure',
+                       [('page-2-dropdown_strip', 'value', 'all'), ('strip_slider', 'value', value)])
+                for value in positions]
+    # The data of the alert is fetched once, the drag itself runs in the browser
+    return [update(session, url, 'strip-data.data', [('page-2-dropdown_strip', 'value', 'all')])]
+
+
+def run(url, clients, steps, legacy):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: gesture(url, steps, legacy), range(clients)))
+    wall = time.perf_counter() - start
+    calls = [call for result in results for call in result]
+    return len(calls) / clients, sum(size for _, size in calls) / clients, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Requests per drag gesture on the sig slider')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--clients', type=int, default=4, help='users dragging at the same time')
+    parser.add_argument('--steps', type=int, default=60, help='slider positions reached during one drag')
+    args = parser.parse_args(argv)
+
+    app = load_app(args.events, FIGURE_CACHE_MB=0)
+    app.app.callback(Output('stripplot-legacy', 'figure'),
+                     Input('page-2-dropdown_strip', 'value'),
+                     Input('strip_slider', 'value'))(legacy_strip_out(app.store))
+    server = Server(app.server)
+
+    for name, legacy in [('before', True), ('after', False)]:
+        requests_per_gesture, bytes_per_gesture, wall = run(server.url, args.clients, args.steps, legacy)
+        print('{:>6}: {:>5.0f} requests and {:>9.0f} bytes per drag gesture, {} clients done in {:.2f}s'.format(
+            name, requests_per_gesture, bytes_per_gesture, args.clients, wall))
+    server.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
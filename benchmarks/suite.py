@@ -0,0 +1,254 @@
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.harness import load_app, Server, update, update_body
+
+
+# The whole suite in one run: ingest, every filter combination of the server callbacks
+# and a multi-client load test. Results are written as JSON and compared between runs:
+#   python -m benchmarks.suite --out before.json
+#   python -m benchmarks.suite --out after.json --compare before.json
+ALERTS = ['all', 'green', 'yellow', 'orange', 'red']
+TSUNAMIS = ['default', 0, 1]
+YEARS = [2010, 2016, 2022]
+ZOOMS = {
+    'scatterplot': {'xaxis.range[0]': '2015-01-01 00:00:00', 'xaxis.range[1]': '2015-12-31 23:59:59'},
+    'page-3-content': {'mapbox.zoom': 4, 'mapbox._derived': {'coordinates': [[130, 42], [148, 42], [148, 30], [130, 30]]}},
+    'page-3-content-2': {'geo.projection.scale': 8, 'geo.center.lon': 139, 'geo.center.lat': 36}
+}
+
+
+# The date picker left on the window of the store, as the page first shows it
+WINDOW = [('window', 'start_date', None), ('window', 'end_date', None), ('backfill', 'n_intervals', None)]
+
+
+def page_1(output, relayout=None):
+    def inputs(alert, tsunami, year):
+        found = [('page-1-dropdown', 'value', alert), ('tsunami_alert', 'value', tsunami), ('slider', 'value', year)]
+        if output == 'scatterplot.figure':
+            found.append(('scatterplot-view', 'data', relayout))
+        return found + WINDOW
+    return inputs
+
+
+def page_3(graph, relayout=None):
+    return lambda alert, tsunami: [('page-3-radios', 'value', alert), ('tsunami', 'value', tsunami),
+                                   (graph + '-view', 'data', relayout)]
+
+
+# name: (output, inputs for a combination, combinations)
+CALLBACKS = {
+    'scatter_out': ('scatterplot.figure', page_1('scatterplot.figure'),
+                    list(itertools.product(ALERTS, TSUNAMIS, YEARS))),
+    'scatter_out.zoomed': ('scatterplot.figure', page_1('scatterplot.figure', ZOOMS['scatterplot']),
+                           [('all', 'default', 2022)]),
+    'barplot_out': ('barplot.figure', page_1('barplot.figure'), list(itertools.product(ALERTS, TSUNAMIS, YEARS))),
+    'boxplot_out': ('boxplot.figure', lambda alert: [('page-2-dropdown', 'value', alert)], [(a,) for a in ALERTS]),
+    'strip_data_out': ('strip-data.data', lambda alert: [('page-2-dropdown_strip', 'value', alert)],
+                       [(a,) for a in ALERTS]),
+    'page_3_radios': ('page-3-content.figure', page_3('page-3-content'), list(itertools.product(ALERTS, TSUNAMIS))),
+    'page_3_radios.zoomed': ('page-3-content.figure', page_3('page-3-content', ZOOMS['page-3-content']),
+                             [('all', 'default')]),
+    'page_3_second': ('page-3-content-2.figure', page_3('page-3-content-2'),
+                      list(itertools.product(ALERTS, TSUNAMIS))),
+    'page_3_second.zoomed': ('page-3-content-2.figure', page_3('page-3-content-2', ZOOMS['page-3-content-2']),
+                             [('all', 'default')]),
+    'display_page': ('page-content.children', lambda path: [('url', 'pathname', path)],
+                     [(p,) for p in ['/', '/page-1', '/page-2', '/page-3']])
+}
+
+# Callbacks of each page, the load test clients visit a page and ask for all of them
+PAGES = {
+    '/page-1': ['scatter_out', 'barplot_out'],
+    '/page-2': ['boxplot_out', 'strip_data_out'],
+    '/page-3': ['page_3_radios', 'page_3_second']
+}
+
+# Units where more is better, every other result is a cost
+HIGHER_IS_BETTER = {'requests/s'}
+
+
+def result(value, unit):
+    return {'value': value, 'unit': unit}
+
+
+# Imported here: data.py reads USGS_URL and CACHE_DIR at import, load_app sets them first
+def bench_ingest(sizes, repeat):
+    from benchmarks import ingest
+    results = {}
+    for n in sizes:
+        geojson = ingest.make_catalog(n)
+        results['ingest.{}'.format(n)] = result(ingest.best_of(ingest.ingest, geojson, repeat), 'seconds')
+    return results
+
+
+def post(client, output, inputs):
+    start = time.perf_counter()
+    response = client.post('/_dash-update-component', json=update_body(output, inputs))
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, (output, inputs, response.status_code)
+    return elapsed, len(response.data)
+
+
+# Every combination without the figure cache, the median of repeat calls. The stages of each
+# callback (filter, build, cache, serialize) come from the metrics registry of the app
+def bench_callbacks(app, repeat):
+    results = {}
+    client = app.server.test_client()
+    max_bytes = app.figures.max_bytes
+    app.figures.max_bytes = 0
+    try:
+        for name, (output, inputs, combinations) in CALLBACKS.items():
+            for combination in combinations:
+                times, size = [], 0
+                for _ in range(repeat):
+                    elapsed, size = post(client, output, inputs(*combination))
+                    times.append(elapsed)
+                key = 'callback.{}.{}'.format(name, '.'.join(str(value) for value in combination))
+                results[key + '.seconds'] = result(statistics.median(times), 'seconds')
+                results[key + '.bytes'] = result(size, 'bytes')
+    finally:
+        app.figures.max_bytes = max_bytes
+    for (metric, labels), histogram in app.registry.histograms.items():
+        labels = dict(labels)
+        if metric == 'callback_seconds' and histogram.count:
+            key = 'stage.{}.{}'.format(labels['callback'], labels['stage'])
+            results[key] = result(histogram.sum / histogram.count, 'seconds')
+    return results
+
+
+# One user: a page at a time, all its callbacks with filters drawn at random
+def user(url, requests_per_client, seed):
+    rnd = random.Random(seed)
+    session = requests.Session()
+    latencies, errors = [], 0
+    while len(latencies) + errors < requests_per_client:
+        for name in PAGES[rnd.choice(list(PAGES))]:
+            output, inputs, combinations = CALLBACKS[name]
+            try:
+                elapsed, _ = update(session, url, output, inputs(*rnd.choice(combinations)))
+                latencies.append(elapsed)
+            except requests.RequestException:
+                errors += 1
+    return latencies, errors
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def bench_load(app, clients, requests_per_client, seed):
+    server = Server(app.server)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        found = list(pool.map(lambda i: user(server.url, requests_per_client, seed + i), range(clients)))
+    wall = time.perf_counter() - start
+    server.stop()
+    latencies = [latency for user_latencies, _ in found for latency in user_latencies]
+    return {
+        'load.throughput': result(len(latencies) / wall, 'requests/s'),
+        'load.p50': result(percentile(latencies, 0.5), 'seconds'),
+        'load.p95': result(percentile(latencies, 0.95), 'seconds'),
+        'load.p99': result(percentile(latencies, 0.99), 'seconds'),
+        'load.errors': result(sum(errors for _, errors in found), 'requests')
+    }
+
+
+# Results worse than the baseline by more than the threshold share, times below floor seconds
+# apart are noise. Sizes are deterministic and get their own, tighter threshold, the load test
+# shares one interpreter between server and clients and gets a looser one
+def compare(baseline, current, threshold, bytes_threshold, load_threshold, floor):
+    regressions = []
+    for name, found in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        old, new, unit = before['value'], found['value'], found['unit']
+        allowed = load_threshold if name.startswith('load.') else threshold
+        if unit in HIGHER_IS_BETTER:
+            worse = new < old * (1 - allowed)
+        elif unit == 'bytes':
+            worse = new > old * (1 + bytes_threshold)
+        elif unit == 'seconds':
+            worse = new > old * (1 + allowed) and new - old > floor
+        else:
+            worse = new > old
+        if worse:
+            regressions.append((name, old, new, unit))
+    return regressions
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite: ingest, callbacks and a load test')
+    parser.add_argument('--events', type=int, default=7000, help='size of the catalog served to the app')
+    parser.add_argument('--ingest-sizes', type=int, nargs='+', default=[7000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=40, help='requests sent by each load test client')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='file to write the results to')
+    parser.add_argument('--compare', help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed slowdown, as a share')
+    parser.add_argument('--bytes-threshold', type=float, default=0.05, help='allowed growth of responses, as a share')
+    parser.add_argument('--load-threshold', type=float, default=1.0,
+                        help='allowed slowdown of the load test, as a share')
+    parser.add_argument('--floor', type=float, default=0.01, help='time differences under this many seconds are noise')
+    args = parser.parse_args(argv)
+
+    results = {}
+    app = load_app(args.events, args.seed)
+    results.update(bench_ingest(args.ingest_sizes, args.repeat))
+    results.update(bench_callbacks(app, args.repeat))
+    results.update(bench_load(app, args.clients, args.requests, args.seed))
+    report = {
+        'meta': {
+            'revision': revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'args': vars(args)
+        },
+        'results': results
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    for name in sorted(results):
+        if not name.startswith('callback.'):
+            print('{:<40} {:>12.4f} {}'.format(name, results[name]['value'], results[name]['unit']))
+    callbacks = [value['value'] for name, value in results.items() if name.endswith('.seconds')]
+    print('{:<40} {:>12.4f} seconds over {} combinations'.format('callback total', sum(callbacks), len(callbacks)))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold, args.bytes_threshold,
+                              args.load_threshold, args.floor)
+        for name, old, new, unit in regressions:
+            print('REGRESSION {}: {:.4f} -> {:.4f} {}'.format(name, old, new, unit))
+        print('{} regression(s) against {}'.format(len(regressions), baseline['meta'].get('revision')))
+        return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import sys
+import json
+import random
+import argparse
+
+# Synthetic catalog in the USGS GeoJSON format, used by the stand-in server and the benchmarks.
+# Same shape as the answers earthquake() gets: metadata, bbox and features with the
+# properties.* and geometry.coordinates of the FDSN event service
+START_MS = 1262304000000  # 2010-01-01
+END_MS = 1633046400000  # 2021-10-01
+ALERT_SHARE = [('green', 0.8), ('yellow', 0.13), ('orange', 0.05), ('red', 0.02)]
+TYPES = ['earthquake'] * 50 + ['nuclear explosion', 'explosion', 'volcanic eruption']
+NETS = ['us', 'ak', 'ci', 'nc', 'hv', 'nn', 'uw']
+PLACES = ['Fiji', 'Tonga', 'Japan', 'Chile', 'Indonesia', 'Papua New Guinea', 'Alaska', 'Peru',
+          'Mexico', 'Philippines', 'CA', 'Vanuatu', 'Solomon Islands', 'Iran', 'Turkey']
+
+# Most events fall along the plate boundaries: (lon, lat, spread in degrees, place) of the busiest
+# zones, the rest of the events anywhere between 60S and 70N
+ZONES = [(178, -18, 4, 'Fiji'), (-175, -20, 3, 'Tonga'), (142, 38, 4, 'Japan'), (-71, -30, 5, 'Chile'),
+         (120, -5, 7, 'Indonesia'), (147, -6, 3, 'Papua New Guinea'), (-152, 59, 5, 'Alaska'),
+         (-76, -12, 4, 'Peru'), (-99, 17, 3, 'Mexico'), (125, 10, 4, 'Philippines'), (-118, 36, 3, 'CA'),
+         (168, -16, 2, 'Vanuatu'), (159, -9, 2, 'Solomon Islands'), (55, 30, 4, 'Iran'), (35, 39, 3, 'Turkey')]
+ZONE_SHARE = 0.75
+
+
+def pick_alert(rnd):
+    x = rnd.random()
+    for alert, share in ALERT_SHARE:
+        if x < share:
+            return alert
+        x -= share
+    return ALERT_SHARE[-1][0]
+
+
+def maybe(rnd, value, missing):
+    return None if rnd.random() < missing else value
+
+
+def position(rnd):
+    if rnd.random() < ZONE_SHARE:
+        lon, lat, spread, region = rnd.choice(ZONES)
+        lon = (lon + rnd.gauss(0, spread) + 180) % 360 - 180
+        lat = max(-89.0, min(89.0, lat + rnd.gauss(0, spread)))
+    else:
+        lon, lat, region = rnd.uniform(-180, 180), rnd.uniform(-60, 70), rnd.choice(PLACES)
+    return round(lon, 4), round(lat, 4), region
+
+
+def feature(rnd, i, alert=None, start=START_MS, end=END_MS):
+    alert = alert or pick_alert(rnd)
+    time = rnd.randint(start, end)
+    mag = round(min(9.5, 2.5 + rnd.expovariate(1.2)), 1)
+    lon, lat, region = position(rnd)
+    place = '{} km {} of {}'.format(rnd.randint(1, 300), rnd.choice('NSEW'), region)
+    return {
+        'type': 'Feature',
+        'id': 'syn{:08d}'.format(i),
+        'properties': {
+            'mag': maybe(rnd, mag, 0.002),
+            'place': maybe(rnd, place, 0.01),
+            'time': time,
+            'updated': time + rnd.randint(0, 10 ** 9),
+            'tz': None,
+            'url': 'https://earthquake.usgs.gov/earthquakes/eventpage/syn{:08d}'.format(i),
+            'detail': 'https://earthquake.usgs.gov/fdsnws/event/1/query?eventid=syn{:08d}&format=geojson'.format(i),
+            'felt': maybe(rnd, rnd.randint(1, 20000), 0.3),
+            'cdi': maybe(rnd, round(rnd.uniform(1, 9), 1), 0.3),
+            'mmi': maybe(rnd, round(rnd.uniform(1, 9), 3), 0.1),
+            'alert': alert,
+            'status': 'reviewed',
+            'tsunami': int(rnd.random() < 0.15),
+            'sig': min(2910, int(mag * 100 + rnd.randint(0, 600))),
+            'net': rnd.choice(NETS),
+            'code': '{:08d}'.format(i),
+            'ids': ',syn{:08d},'.format(i),
+            'sources': ',us,',
+            'types': ',dyfi,losspager,origin,phase-data,shakemap,',
+            'nst': None,
+            'dmin': maybe(rnd, round(rnd.uniform(0, 20), 3), 0.2),
+            'rms': round(rnd.uniform(0.1, 1.5), 2),
+            'gap': round(rnd.uniform(10, 200), 0),
+            'magType': rnd.choice(['mww', 'mb', 'ml', 'mw']),
+            'type': rnd.choice(TYPES),
+            'title': 'M {} - {}'.format(mag, place)
+        },
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [lon, lat, round(rnd.uniform(0, 650), 2)]
+        }
+    }
+
+
+# start and end in ms since the epoch, the default span is the one the app loads
+def catalog(n, seed=0, alert=None, start=START_MS, end=END_MS):
+    rnd = random.Random(seed)
+    return [feature(rnd, i, alert, start, end) for i in range(n)]
+
+
+def geojson(features):
+    coordinates = [f['geometry']['coordinates'] for f in features] or [[0, 0, 0]]
+    return {
+        'type': 'FeatureCollection',
+        'metadata': {
+            'generated': END_MS,
+            'url': 'https://earthquake.usgs.gov/fdsnws/event/1/query',
+            'title': 'USGS Earthquakes',
+            'status': 200,
+            'api': '1.12.3',
+            'count': len(features)
+        },
+        'features': features,
+        'bbox': [min(c[0] for c in coordinates), min(c[1] for c in coordinates), min(c[2] for c in coordinates),
+                 max(c[0] for c in coordinates), max(c[1] for c in coordinates), max(c[2] for c in coordinates)]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic catalog as USGS GeoJSON')
+    parser.add_argument('--events', type=int, default=7000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--alert', choices=[alert for alert, _ in ALERT_SHARE], help='only this alert level')
+    parser.add_argument('--out', default='-', help='file to write, - for stdout')
+    args = parser.parse_args(argv)
+
+    found = geojson(catalog(args.events, args.seed, args.alert))
+    if args.out == '-':
+        json.dump(found, sys.stdout)
+    else:
+        with open(args.out, 'w') as f:
+            json.dump(found, f)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+
+# 2000-01-01 to 2023-11-14, the synthetic catalog spreads over all of it
+START_MS = 946684800000
+END_MS = 1700000000000
+WINDOWS = [('2015-06-01', '2016-06-01'), ('2012-01-01', '2018-01-01'), ('2005-01-01', '2012-01-01'),
+           ('2000-01-01', '2023-11-01')]
+
+
+# Time until a window first answers with the months there are, until all of its months are in,
+# and the memory it holds: the months read and the index of the window. Each window starts from
+# an empty partition cache in memory, the files of the earlier windows stay on disk
+def measure(data, seed, start, end, timeout):
+    partitions = data.Partitions(seed=seed)
+    begin = time.perf_counter()
+    index, found, wanted = partitions.window(start, end)
+    first = time.perf_counter() - begin
+    while found < wanted and time.perf_counter() - begin < timeout:
+        time.sleep(0.05)
+        index, found, wanted = partitions.window(start, end)
+    done = time.perf_counter() - begin
+    return first, done, found, wanted, len(index.df), partitions.status()['bytes'], data.memory_report(index.df).sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time to first and complete answer and memory per date window')
+    parser.add_argument('--events', type=int, default=100000, help='events between 2000 and 2023')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds of each USGS answer')
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args(argv)
+
+    fake = FakeUSGS(synthetic.catalog(args.events, start=START_MS, end=END_MS), latency=args.latency).start()
+    os.environ['USGS_URL'] = fake.url
+    os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='earthquake-cache-')
+    # Imported here: data.py reads USGS_URL and CACHE_DIR at import
+    import data
+    store = data.EventStore()
+    store.start_load()
+    whole = store.wait(timeout=None)
+    print('event store {} to {}: {:,} events, {:.1f} MB'.format(
+        store.starttime, store.endtime, len(whole.df), data.memory_report(whole.df).sum() / 1e6))
+
+    print('{:>24} {:>9} {:>9} {:>9} {:>10} {:>11} {:>11}'.format(
+        'window', 'first', 'complete', 'months', 'events', 'months MB', 'index MB'))
+    for start, end in WINDOWS:
+        first, done, found, wanted, events, raw, index = measure(
+            data, (store.starttime, store.endtime), start, end, args.timeout)
+        print('{:>24} {:>8.2f}s {:>8.2f}s {:>4}/{:<4} {:>10,} {:>8.1f} MB {:>8.1f} MB'.format(
+            '{}..{}'.format(start, end), first, done, found, wanted, events, raw / 1e6, index / 1e6))
+    fake.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import re
+import sys
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import subprocess
+
+import requests
+
+from benchmarks import synthetic
+from benchmarks.fake_usgs import FakeUSGS
+from benchmarks.harness import update
+from benchmarks.suite import WINDOW
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'separate': {},
+    'shared': {'SHARED_EVENTS': 1},
+    'preload': {'SHARED_EVENTS': 1, 'PRELOAD': 1}
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    with open('/proc/{0}/task/{0}/children'.format(pid)) as f:
+        return [int(child) for child in f.read().split()]
+
+
+# Resident memory, and the proportional share of it: a page mapped by n workers counts 1/n in each
+def memory(pid):
+    with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+        found = dict(re.findall(r'^(Rss|Pss):\s+(\d+) kB', f.read(), re.M))
+    return int(found['Rss']) * 1024, int(found['Pss']) * 1024
+
+
+# Every worker logs the table it published or mapped, with preload it is the master that loads
+def wait_loaded(log, master, workers, timeout=600):
+    start = time.time()
+    while time.time() - start < timeout:
+        with open(log) as f:
+            loaded = {int(pid) for pid in re.findall(r'event table \w+: .* in worker (\d+)', f.read())}
+        if master in loaded or set(workers) <= loaded:
+            return
+        time.sleep(0.2)
+    raise TimeoutError('workers not loaded after {}s'.format(timeout))
+
+
+def run(fake, workers, env, calls):
+    port = free_port()
+    log = tempfile.mktemp(suffix='.log')
+    env = dict(os.environ, USGS_URL=fake.url, CACHE_DIR=tempfile.mkdtemp(prefix='earthquake-cache-'),
+               **{key: str(value) for key, value in env.items()})
+    fake.requests = 0
+    with open(log, 'w') as out:
+        master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b',
+                                   '127.0.0.1:{}'.format(port), 'app:server'],
+                                  cwd=ROOT, env=env, stdout=out, stderr=subprocess.STDOUT)
+    try:
+        url = 'http://127.0.0.1:{}'.format(port)
+        while True:
+            try:
+                if requests.get(url + '/ready').status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.2)
+        pids = children(master.pid)
+        while len(pids) < workers:
+            time.sleep(0.2)
+            pids = children(master.pid)
+        wait_loaded(log, master.pid, pids)
+        # Some traffic so the workers hold what serving figures needs, not only the table
+        session = requests.Session()
+        for alert in ['all', 'green', 'yellow', 'orange', 'red'] * (calls // 5):
+            update(session, url, 'scatterplot.figure', [('page-1-dropdown', 'value', alert),
+                                                        ('tsunami_alert', 'value', 'default'),
+                                                        ('slider', 'value', 2022),
+                                                        ('scatterplot-view', 'data', None)] + WINDOW)
+        sizes = [memory(pid) for pid in pids]
+        return sizes, fake.requests
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+        os.remove(log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memory per gunicorn worker and USGS requests against worker count')
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--calls', type=int, default=20, help='scatter callbacks served before measuring')
+    args = parser.parse_args(argv)
+
+    fake = FakeUSGS(synthetic.catalog(args.events)).start()
+    print('{:>9} {:>8} {:>13} {:>13} {:>13} {:>9}'.format(
+        'mode', 'workers', 'RSS/worker', 'PSS/worker', 'PSS total', 'requests'))
+    for mode in args.modes:
+        for workers in args.workers:
+            sizes, upstream = run(fake, workers, MODES[mode], args.calls)
+            rss = sum(size[0] for size in sizes) / len(sizes)
+            pss = sum(size[1] for size in sizes)
+            print('{:>9} {:>8} {:>10.1f} MB {:>10.1f} MB {:>10.1f} MB {:>9}'.format(
+                mode, workers, rss / 1e6, pss / len(sizes) / 1e6, pss / 1e6, upstream))
+    fake.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,736 @@
+import os
+import json
+import hashlib
+import contextlib
+import time
+import logging
+import tempfile
+import threading
+import datetime as dt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import numpy as np
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import query
+from metrics import registry
+
+
+log = logging.getLogger(__name__)
+
+#######################################
+########USGS QUERY#####################
+#######################################
+path = os.environ.get('USGS_URL', r"https://earthquake.usgs.gov/fdsnws/event/1/query?")
+STARTTIME = '2010-01-01'
+ENDTIME = '2021-10-1'
+ALERTS = ['green', 'yellow', 'orange', 'red']
+
+# Queries run in parallel, each alert level split in windows of CHUNK_MONTHS months
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+CHUNK_MONTHS = int(os.environ.get('CHUNK_MONTHS', 12))
+TIMEOUT = (10, 120)
+
+# Seconds between two tries of a failed background load, and the longest a callback
+# waits for the first load before it gives up
+LOAD_RETRY = int(os.environ.get('LOAD_RETRY', 30))
+LOAD_WAIT = int(os.environ.get('LOAD_WAIT', 25))
+
+# Cleaned frames are stored here, one file per query window and alert level
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+# With SHARED_EVENTS set the gunicorn workers keep one copy of the event table between them.
+# The first worker to take the load lock fetches and cleans, writes the table as an Arrow file
+# and every worker maps that file read-only. A sync writes a new file, the workers look for it
+# every FOLLOW_INTERVAL seconds
+SHARED_EVENTS = bool(int(os.environ.get('SHARED_EVENTS', 0)))
+FOLLOW_INTERVAL = 5
+
+# With PRELOAD set (read by gunicorn.conf.py too) the gunicorn master imports the app only to load
+# the events and fork the workers. It runs no sync loop, the workers do
+PRELOAD = bool(int(os.environ.get('PRELOAD', 0)))
+
+# Other date windows are read from one file of raw events per month, see Partitions.
+# The months read are kept in an LRU of PARTITION_CACHE_MB per worker, and the last
+# WINDOWS_KEPT windows built. Missing months are fetched by BACKFILL_WORKERS threads
+EARLIEST = '2000-01-01'
+PARTITION_CACHE_MB = int(os.environ.get('PARTITION_CACHE_MB', 128))
+BACKFILL_WORKERS = int(os.environ.get('BACKFILL_WORKERS', 2))
+WINDOWS_KEPT = 4
+# The current month is still filling up, its file is fetched again once it is this many seconds old
+OPEN_MONTH_TTL = 3600
+
+COLUMNS = {
+    'id': 'id',
+    'properties.mag': 'magnitude',
+    'properties.place': 'location',
+    'properties.time': 'time',
+    'properties.updated': 'updated',
+    'properties.felt': 'felt',
+    'properties.cdi': 'cdi',
+    'properties.mmi': 'mmi',
+    'properties.alert': 'alert',
+    'properties.tsunami': 'tsunami',
+    'properties.sig': 'sig',
+    'properties.net': 'net',
+    'properties.dmin': 'dmin',
+    'properties.type': 'type'
+}
+
+# Compact types of the event table, every gunicorn worker keeps its own copy.
+# The detail URL and the raw coordinates list are not used by the app and are not kept
+SCHEMA = {
+    'id': object,
+    'magnitude': 'float32',
+    'location': object,
+    'time': 'datetime64[ns]',
+    'updated': 'int64',
+    'felt': 'float32',
+    'cdi': 'float32',
+    'mmi': 'float32',
+    'alert': pd.CategoricalDtype(ALERTS),
+    'tsunami': pd.CategoricalDtype([0, 1]),
+    'sig': 'int16',
+    'net': 'category',
+    'dmin': 'float32',
+    'type': 'category',
+    'latitud': 'float32',
+    'longitud': 'float32',
+    'depth': 'float32'
+}
+
+
+# One pooled session for every query, 429 and 5xx answers are retried with backoff
+def make_session(backoff=0.5):
+    retry = Retry(total=5, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                  respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = make_session()
+
+
+# A forked worker opens its own connections, the pooled keep-alive sockets of the parent would be
+# shared with it and requests of both processes could interleave on one of them. Registered at
+# import, so it runs before the fork hooks of the stores, which may start fetching right away
+def new_session():
+    global session
+    session = make_session()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=new_session)
+
+
+def earthquake(path, starttime, endtime, alert, updatedafter=None):
+    paramss = {"format": "geojson", "starttime": starttime, "endtime": endtime, "alertlevel": alert,
+               "updatedafter": updatedafter}
+    data = session.get(path, params = paramss, timeout=TIMEOUT)
+    data.raise_for_status()
+    # json.loads reads the bytes directly, no need to decode the body to str first
+    data = json.loads(data.content)
+    return data
+
+
+def windows(starttime, endtime, months=CHUNK_MONTHS):
+    start = pd.Timestamp(starttime)
+    end = pd.Timestamp(endtime) if endtime else pd.Timestamp.utcnow().tz_localize(None)
+    bounds = list(pd.date_range(start, end, freq='{}MS'.format(months))) if months else []
+    bounds = [start] + [b for b in bounds if start < b < end] + [end]
+    return [(a.isoformat(), b.isoformat()) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+# Runs every (alert, window) query at the same time and joins the features of each alert.
+# Events on the edge of two windows come back twice, so they are deduplicated by id
+def fetch(starttime, endtime, alerts=ALERTS, updatedafter=None, months=CHUNK_MONTHS):
+    jobs = [(alert, a, b) for alert in alerts for a, b in windows(starttime, endtime, months)]
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = list(pool.map(lambda job: earthquake(path, job[1], job[2], job[0], updatedafter), jobs))
+    features = {alert: {} for alert in alerts}
+    for (alert, _, _), result in zip(jobs, results):
+        for feature in result['features']:
+            features[alert][feature['id']] = feature
+    return {alert: {'features': list(found.values())} for alert, found in features.items()}
+
+
+#######################################
+########DATAFRAME######################
+#######################################
+PROPERTIES = [column.split('.', 1)[1] for column in COLUMNS if column.startswith('properties.')]
+FLOATS = ['magnitude', 'felt', 'cdi', 'mmi', 'dmin']
+
+
+def compact(df):
+    return df[list(SCHEMA)].astype(SCHEMA)
+
+
+def memory_report(df):
+    return df.memory_usage(index=True, deep=True)
+
+
+# Same table, same version, in every worker and across restarts
+def fingerprint(df):
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+
+# Convert the JSON of one query to a Pandas dataframe with the columns used by the app.
+# Columns are built straight from the feature dicts, no per-row Python work after that
+def normalize(data):
+    features = data['features']
+    df = pd.DataFrame.from_records([feature['properties'] for feature in features], columns=PROPERTIES)
+    df.columns = [COLUMNS['properties.' + name] for name in PROPERTIES]
+    df.insert(0, 'id', [feature['id'] for feature in features])
+    df[FLOATS] = df[FLOATS].astype(float)
+    # Whole seconds like the app always showed, in UTC
+    df['time'] = pd.to_datetime(df.time // 1000, unit='s', utc=True).dt.tz_localize(None)
+    coordinates = np.array([feature['geometry']['coordinates'] for feature in features], dtype=float)
+    coordinates = coordinates.reshape(len(features), 3)
+    df['latitud'] = coordinates[:, 0]
+    df['longitud'] = coordinates[:, 1]
+    df['depth'] = coordinates[:, 2]
+    return compact(df)
+
+
+# Filling Missing Values, works on a copy so the raw frame can be cleaned again after a sync
+def clean(df2):
+    df2 = df2.copy()
+    df2.felt = df2.felt.fillna(0)
+    df2.cdi = df2.cdi.fillna(0)
+    df2.dmin = df2.dmin.fillna(df2.dmin.median())
+    df2.location = df2.location.fillna('Unknown')
+    green_mag = df2.magnitude[df2.alert == 'green']
+    df2.magnitude = df2.magnitude.fillna(green_mag.mean())
+    return df2
+
+
+#######################################
+########CACHE##########################
+#######################################
+# Every file the workers share is written to a temporary file first and moved in place,
+# so another worker never reads half a file. The temporary name is unique to the call, two
+# threads of a worker writing the same file don't write to the same temporary file
+def replace_file(file, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(file), prefix=os.path.basename(file) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, file)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+
+def write_feather(df, file, **options):
+    replace_file(file, lambda tmp: df.reset_index(drop=True).to_feather(tmp, **options))
+
+
+def write_text(file, text):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            f.write(text)
+    replace_file(file, write)
+
+
+# Files written before a column was added miss it, the callers treat them as a miss
+def has_schema(columns):
+    return set(SCHEMA) <= set(columns)
+
+
+# An open window (endtime None) is the one kept up to date by the sync
+def cache_file(starttime, endtime, alert):
+    return os.path.join(CACHE_DIR, '{}_{}_{}.feather'.format(starttime, endtime or 'latest', alert))
+
+
+def save_alert(df, starttime, endtime, alert):
+    file = cache_file(starttime, endtime, alert)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    write_feather(df, file)
+
+
+def read_alert(starttime, endtime, alert):
+    file = cache_file(starttime, endtime, alert)
+    if os.path.exists(file):
+        df = pd.read_feather(file)
+        if has_schema(df.columns):
+            return compact(df)
+    return None
+
+
+# Empty query results have object columns, leave them out so the dtypes stay right.
+# Categories differ between frames, compact() brings them back after the concat
+def concat(frames):
+    full = [df for df in frames if not df.empty]
+    return compact(pd.concat(full or frames[:1], ignore_index=True))
+
+
+def load_events(starttime=STARTTIME, endtime=ENDTIME):
+    start = time.perf_counter()
+    frames = {alert: read_alert(starttime, endtime, alert) for alert in ALERTS}
+    misses = [alert for alert, df in frames.items() if df is None]
+    if misses:
+        with registry.timer('ingest_seconds', stage='fetch'):
+            found = fetch(starttime, endtime, misses)
+        for alert, data in found.items():
+            with registry.timer('ingest_seconds', stage='normalize'):
+                frames[alert] = normalize(data)
+            save_alert(frames[alert], starttime, endtime, alert)
+    raw = concat(list(frames.values()))
+    log.info('event cache: %d hit(s), %d miss(es), %d events loaded in %.2fs',
+             len(ALERTS) - len(misses), len(misses), len(raw), time.perf_counter() - start)
+    return raw
+
+
+#######################################
+########SHARED TABLE###################
+#######################################
+def shared_dir(starttime, endtime):
+    return os.path.join(CACHE_DIR, 'shared', '{}_{}'.format(starttime, endtime or 'latest'))
+
+
+# Lock held by one process of the machine at a time, yields False when blocking is off and
+# another process has it. fcntl is POSIX only, like gunicorn
+@contextlib.contextmanager
+def file_lock(folder, name, blocking=True):
+    import fcntl
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name + '.lock'), 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def current_version(folder):
+    try:
+        with open(os.path.join(folder, 'current')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# The version file is replaced last, a worker that reads it always finds the whole table
+def share(df, version, folder):
+    file = os.path.join(folder, version + '.arrow')
+    write_feather(df, file, compression='uncompressed')
+    write_text(os.path.join(folder, 'current'), version)
+    # Workers still on an older version keep their mapping after the file is removed
+    for name in os.listdir(folder):
+        if name.endswith('.arrow') and name != version + '.arrow':
+            os.remove(os.path.join(folder, name))
+
+
+# Numeric columns stay views on the mapped file, the strings are kept as Arrow strings,
+# so the pages of the table are shared by every worker instead of copied in each one
+def open_shared(version, folder):
+    import pyarrow as pa
+    file = os.path.join(folder, version + '.arrow')
+    if not os.path.exists(file):
+        return None
+    table = pa.ipc.open_file(pa.memory_map(file, 'r')).read_all()
+    if not has_schema(table.column_names):
+        return None
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+
+#######################################
+########SYNC###########################
+#######################################
+# Replace the rows of the events found in delta and add the new ones
+def upsert(raw, delta):
+    if delta.empty:
+        return raw
+    delta = delta.drop_duplicates('id', keep='last')
+    raw = raw[~raw.id.isin(delta.id)]
+    return concat([raw, delta])
+
+
+class EventStore:
+    def __init__(self, starttime=STARTTIME, endtime=ENDTIME):
+        self.starttime = starttime
+        self.endtime = endtime
+        self.raw = None
+        self.df = None
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.loader = None
+        self.created = time.perf_counter()
+        self.ready_after = None
+        self.error = None
+        self.sync_interval = 0
+        self.syncs = not PRELOAD
+        self.folder = shared_dir(starttime, endtime)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+
+    def publish(self, raw):
+        # The raw frame is only needed by the sync, which runs on the open window.
+        # Shared tables read it back from the cache files instead, only the mapped table is kept
+        self.raw = raw if self.endtime is None and not SHARED_EVENTS else None
+        with registry.timer('ingest_seconds', stage='clean'):
+            df = clean(raw)
+            version = fingerprint(df)
+        if SHARED_EVENTS:
+            with registry.timer('ingest_seconds', stage='share'):
+                share(df, version, self.folder)
+                df = open_shared(version, self.folder)
+        self.swap(df, version)
+
+    def swap(self, df, version):
+        # Callbacks read self.index once per call, so swapping the reference is enough
+        with registry.timer('ingest_seconds', stage='index'):
+            index = query.EventIndex(df, version)
+        self.index = index
+        self.df = df
+        self.version = version
+        log.info('event table %s: %d rows, %.2f MB in worker %d', version, len(df),
+                 memory_report(df).sum() / 1e6, os.getpid())
+
+    def load(self):
+        if not SHARED_EVENTS:
+            self.publish(load_events(self.starttime, self.endtime))
+            return self.df
+        # The first worker to get the lock loads for all of them, the others map its table
+        with file_lock(self.folder, 'load'):
+            version = current_version(self.folder)
+            df = open_shared(version, self.folder) if version else None
+            if df is None:
+                self.publish(load_events(self.starttime, self.endtime))
+                write_text(os.path.join(self.folder, 'synced'), self.version)
+            else:
+                self.swap(df, version)
+        return self.df
+
+    # Switches to the table another worker shared after a sync
+    def follow(self):
+        version = current_version(self.folder)
+        if version is not None and version != self.version:
+            df = open_shared(version, self.folder)
+            if df is not None:
+                self.swap(df, version)
+
+    # Loads the events in a thread, once per store, retrying until USGS answers.
+    # The sync starts after the first load when sync_interval is set
+    def start_load(self, sync_interval=0):
+        if self.loader is not None:
+            return self.loader
+        with self.lock:
+            if self.loader is None:
+                self.sync_interval = sync_interval
+                self.loader = threading.Thread(target=self.run_load, args=(sync_interval,),
+                                               name='event-load', daemon=True)
+                self.loader.start()
+        return self.loader
+
+    def run_load(self, sync_interval):
+        while True:
+            try:
+                self.load()
+                break
+            except Exception as error:
+                self.error = repr(error)
+                log.exception('event load failed, next try in %ds', LOAD_RETRY)
+                time.sleep(LOAD_RETRY)
+        self.error = None
+        self.ready_after = time.perf_counter() - self.created
+        self.loaded.set()
+        log.info('event store ready %.2fs after start', self.ready_after)
+        if sync_interval and self.syncs:
+            self.start_sync(sync_interval)
+
+    # Index of the events, the first callbacks wait here while the load runs
+    def wait(self, timeout=LOAD_WAIT):
+        self.start_load()
+        if not self.loaded.wait(timeout):
+            raise TimeoutError('events not loaded after {}s'.format(timeout))
+        return self.index
+
+    def status(self):
+        return {
+            'ready': self.loaded.is_set(),
+            'version': self.version,
+            'rows': None if self.df is None else len(self.df),
+            'seconds': self.ready_after,
+            'error': self.error
+        }
+
+    # Threads don't survive a fork. With gunicorn --preload the workers start the load again
+    # when the master had not finished it, and run their own sync loop
+    def after_fork(self):
+        self.lock = threading.Lock()
+        self.syncs = True
+        if not self.loaded.is_set():
+            self.loaded = threading.Event()
+            self.loader = None
+            self.start_load(self.sync_interval)
+        elif self.sync_interval:
+            self.start_sync(self.sync_interval)
+
+    # High-water marks of the stored events, the next sync asks USGS only for what changed after them
+    def watermarks(self, raw):
+        if raw.empty:
+            return None, None
+        return raw.time.max(), int(raw.updated.max())
+
+    def sync(self):
+        with self.lock:
+            start = time.perf_counter()
+            raw = self.raw if self.raw is not None else load_events(self.starttime, self.endtime)
+            last_time, last_updated = self.watermarks(raw)
+            updatedafter = None
+            if last_updated is not None:
+                updatedafter = dt.datetime.utcfromtimestamp((last_updated + 1) / 1000.0).isoformat()
+            # The delta is small, one query per alert level is enough
+            with registry.timer('ingest_seconds', stage='fetch'):
+                found = fetch(self.starttime, self.endtime, updatedafter=updatedafter, months=0)
+            with registry.timer('ingest_seconds', stage='normalize'):
+                delta = concat([normalize(data) for data in found.values()])
+            if delta.empty:
+                log.info('event sync: no changes since %s', updatedafter)
+                return 0
+            new = (~delta.id.isin(raw.id)).sum()
+            raw = upsert(raw, delta)
+            for alert in ALERTS:
+                save_alert(raw[raw.alert == alert], self.starttime, self.endtime, alert)
+            self.publish(raw)
+            log.info('event sync: %d new, %d revised event(s) after %s in %.2fs', new, len(delta) - new,
+                     last_time, time.perf_counter() - start)
+            return len(delta)
+
+    # One worker syncs for all of them: the one holding the sync lock once the last sync,
+    # from any worker, is interval seconds old. The others pick up its table with follow()
+    def sync_shared(self, interval):
+        self.follow()
+        stamp = os.path.join(self.folder, 'synced')
+        with file_lock(self.folder, 'sync', blocking=False) as leader:
+            if not leader or (os.path.exists(stamp) and time.time() - os.path.getmtime(stamp) < interval):
+                return 0
+            found = self.sync()
+            write_text(stamp, self.version)
+            return found
+
+    def start_sync(self, interval):
+        def run():
+            while True:
+                time.sleep(min(interval, FOLLOW_INTERVAL) if SHARED_EVENTS else interval)
+                try:
+                    if SHARED_EVENTS:
+                        self.sync_shared(interval)
+                    else:
+                        self.sync()
+                except Exception:
+                    log.exception('event sync failed')
+
+        thread = threading.Thread(target=run, name='event-sync', daemon=True)
+        thread.start()
+        return thread
+
+
+#######################################
+########PARTITIONS#####################
+#######################################
+def now():
+    return pd.Timestamp.utcnow().tz_localize(None)
+
+
+# Last day of a window, the one a date picker shows
+def last_day(endtime):
+    return None if endtime is None else (pd.Timestamp(endtime) - pd.Timedelta(days=1)).date().isoformat()
+
+
+# First and last year of the window [starttime, endtime), an open window runs to now
+def window_years(starttime, endtime):
+    end = pd.Timestamp(endtime) - pd.Timedelta(1, 's') if endtime else now()
+    return pd.Timestamp(starttime).year, end.year
+
+
+# Month starts of the window [start, end)
+def months(start, end):
+    return list(pd.date_range(start.to_period('M').to_timestamp(), end - pd.Timedelta(1, 's'), freq='MS'))
+
+
+def month_file(folder, month):
+    return os.path.join(folder, '{:%Y-%m}.feather'.format(month))
+
+
+def empty():
+    return compact(pd.DataFrame({column: [] for column in SCHEMA}))
+
+
+# Events of any date window, CACHE_DIR/months holds the raw events of each month in a file.
+# A window reads only its months, the ones not on disk yet are fetched in the background and
+# the window is served with the months there are, it grows as the others come in.
+# Months inside the window of the EventStore (seed) are split from its cache files instead of
+# fetched again. The files are shared by the gunicorn workers, a month is fetched by one of them
+class Partitions:
+    def __init__(self, seed=(STARTTIME, ENDTIME), folder=None, max_bytes=PARTITION_CACHE_MB * 10 ** 6):
+        self.seed_window = seed
+        self.seeded = False
+        self.folder = folder or os.path.join(CACHE_DIR, 'months')
+        self.max_bytes = max_bytes
+        # month: (raw frame, mtime of its file, bytes)
+        self.frames = OrderedDict()
+        self.bytes = 0
+        self.windows = OrderedDict()
+        self.pending = set()
+        self.failed = {}
+        self.lock = threading.Lock()
+        self.pool = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pending = set()
+
+    # Raw events of a month and the mtime of its file, None when there is no file yet
+    def read(self, month):
+        file = month_file(self.folder, month)
+        try:
+            stamp = os.stat(file).st_mtime_ns
+        except FileNotFoundError:
+            return None, None
+        with self.lock:
+            found = self.frames.get(month)
+            if found is not None and found[1] == stamp:
+                self.frames.move_to_end(month)
+                return found[0], stamp
+        df = pd.read_feather(file)
+        if not has_schema(df.columns):
+            return None, None
+        df = compact(df)
+        size = memory_report(df).sum()
+        with self.lock:
+            if month in self.frames:
+                self.bytes -= self.frames.pop(month)[2]
+            self.frames[month] = (df, stamp, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self.frames) > 1:
+                _, (_, _, old) = self.frames.popitem(last=False)
+                self.bytes -= old
+        return df, stamp
+
+    def stale(self, month, stamp):
+        current = now().to_period('M').to_timestamp()
+        return month >= current and time.time() - stamp / 1e9 > OPEN_MONTH_TTL
+
+    # Fetches a month in the background, once at a time. A month that failed waits LOAD_RETRY seconds
+    def backfill(self, month):
+        with self.lock:
+            if month in self.pending or time.time() - self.failed.get(month, 0) < LOAD_RETRY:
+                return
+            self.pending.add(month)
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=BACKFILL_WORKERS, thread_name_prefix='backfill')
+        self.pool.submit(self.run_backfill, month)
+
+    def run_backfill(self, month):
+        file = month_file(self.folder, month)
+        try:
+            if self.inside_seed(month):
+                self.seed()
+            # Another worker fetching the month has the lock, its file shows up on a later call
+            with file_lock(os.path.join(self.folder, 'locks'), '{:%Y-%m}'.format(month), blocking=False) as owner:
+                if not owner or (os.path.exists(file) and not self.stale(month, os.stat(file).st_mtime_ns)):
+                    return
+                start = time.perf_counter()
+                end = month + pd.offsets.MonthBegin()
+                with registry.timer('ingest_seconds', stage='fetch'):
+                    found = fetch(month.isoformat(), end.isoformat(), months=0)
+                with registry.timer('ingest_seconds', stage='normalize'):
+                    df = concat([normalize(data) for data in found.values()])
+                write_feather(df, file)
+                log.info('backfill %s: %d events in %.2fs', '{:%Y-%m}'.format(month), len(df),
+                         time.perf_counter() - start)
+            self.failed.pop(month, None)
+        except Exception:
+            self.failed[month] = time.time()
+            log.exception('backfill of %s failed, next try in %ds', '{:%Y-%m}'.format(month), LOAD_RETRY)
+        finally:
+            with self.lock:
+                self.pending.discard(month)
+
+    # Whole months of the seed window, an open window up to the current month
+    def seed_months(self):
+        starttime, endtime = self.seed_window
+        end = pd.Timestamp(endtime) if endtime else now()
+        return [month for month in months(pd.Timestamp(starttime), end)
+                if month >= pd.Timestamp(starttime) and month + pd.offsets.MonthBegin() <= end]
+
+    def inside_seed(self, month):
+        found = self.seed_months()
+        return not self.seeded and bool(found) and found[0] <= month <= found[-1]
+
+    # Splits the cache files of the seed window in months, once per machine
+    def seed(self):
+        with file_lock(os.path.join(self.folder, 'locks'), 'seed'):
+            missing = [month for month in self.seed_months() if not os.path.exists(month_file(self.folder, month))]
+            if missing:
+                frames = [read_alert(*self.seed_window, alert) for alert in ALERTS]
+                # Not loaded yet, the months are fetched like any other
+                if any(df is None for df in frames):
+                    return
+                raw = concat(frames)
+                times = raw.time.to_numpy()
+                for month in missing:
+                    end = month + pd.offsets.MonthBegin()
+                    rows = (times >= month.to_datetime64()) & (times < end.to_datetime64())
+                    write_feather(raw[rows], month_file(self.folder, month))
+                log.info('backfill: %d month(s) split from the event cache', len(missing))
+        self.seeded = True
+
+    # Index of the events in [start, end) from the months on disk, with how many of the months
+    # of the window it has and how many there are. Missing months are fetched in the background.
+    # The version depends on the files read, a month coming in makes a new version.
+    # Nothing before EARLIEST is fetched, whatever the window asked for
+    def window(self, start, end):
+        start, end = max(pd.Timestamp(start), pd.Timestamp(EARLIEST)), pd.Timestamp(end)
+        os.makedirs(self.folder, exist_ok=True)
+        wanted = [month for month in months(start, end) if month <= now()]
+        frames, stamps = [], []
+        for month in wanted:
+            df, stamp = self.read(month)
+            if df is None or self.stale(month, stamp):
+                self.backfill(month)
+            if df is not None:
+                frames.append(df)
+                stamps.append((month, stamp))
+        version = hashlib.sha1(repr((start, end, stamps)).encode()).hexdigest()[:16]
+        with self.lock:
+            if version in self.windows:
+                self.windows.move_to_end(version)
+                return self.windows[version], len(frames), len(wanted)
+        df = concat(frames).drop_duplicates('id') if frames else empty()
+        df = df[(df.time >= start) & (df.time < end)].reset_index(drop=True)
+        index = query.EventIndex(clean(df), version)
+        with self.lock:
+            self.windows[version] = index
+            while len(self.windows) > WINDOWS_KEPT:
+                self.windows.popitem(last=False)
+        return index, len(frames), len(wanted)
+
+    def status(self):
+        with self.lock:
+            return {
+                'months': len(self.frames),
+                'bytes': int(self.bytes),
+                'windows': len(self.windows),
+                'pending': len(self.pending),
+                'failed': len(self.failed)
+            }
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import functools
+import threading
+import contextlib
+from collections import OrderedDict
+
+from data import write_text
+
+
+#######################################
+########FIGURE CACHE###################
+#######################################
+# The figures of a dataset version are written to <directory>/figures/<version>. Only folders
+# named like a version (the fingerprint of the dataset) are ever removed, and only once nothing
+# was written to them for PRUNE_AFTER seconds: a worker that has not synced yet still uses its own
+VERSION_NAME = re.compile(r'[0-9a-f]{16}$')
+PRUNE_AFTER = 600
+# Other workers write to the folder too, its size is read again every MEASURE_EVERY writes
+MEASURE_EVERY = 64
+
+
+def folder_bytes(folder):
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+# Figures already built for a set of callback inputs, kept as plain JSON-ready dicts.
+# The memory part is an LRU bounded by the size of the serialized figures. With a directory
+# the figures are also written there, so the gunicorn workers sharing the folder reuse them,
+# until the folder of the version holds about max_disk_bytes.
+# Keys include the dataset version, a new version never sees the figures of the old one.
+# stage(name) is a context manager around the work of storing a figure, for the metrics
+class FigureCache:
+    def __init__(self, version, max_bytes=64 * 10 ** 6, directory=None, stage=None, max_disk_bytes=512 * 10 ** 6):
+        self.version = version
+        self.stage = stage or (lambda name: contextlib.nullcontext())
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_bytes = 0
+        self.writes = 0
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.current = None
+        self.lock = threading.Lock()
+
+    def file(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, 'figures', str(key[0]), name + '.json')
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+        if self.directory and os.path.exists(self.file(key)):
+            with open(self.file(key), 'rb') as f:
+                text = f.read()
+            figure = json.loads(text)
+            self.put(key, figure, len(text))
+            with self.lock:
+                self.disk_hits += 1
+            return figure
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, figure, size):
+        with self.lock:
+            # Figures of an older dataset version can't be asked for again
+            if key[0] != self.current:
+                self.entries.clear()
+                self.bytes = 0
+                self.current = key[0]
+                self.disk_bytes = 0
+                self.writes = 0
+                self.prune()
+            if size > self.max_bytes:
+                return
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (figure, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, old) = self.entries.popitem(last=False)
+                self.bytes -= old
+
+    def prune(self):
+        root = os.path.join(self.directory or '', 'figures')
+        if not self.directory or not os.path.isdir(root):
+            return
+        for entry in os.scandir(root):
+            if (entry.is_dir() and VERSION_NAME.match(entry.name) and entry.name != str(self.current)
+                    and time.time() - entry.stat().st_mtime > PRUNE_AFTER):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def write(self, key, text):
+        file = self.file(key)
+        with self.lock:
+            if self.writes % MEASURE_EVERY == 0:
+                self.disk_bytes = folder_bytes(os.path.dirname(file))
+                self.prune()
+            self.writes += 1
+            if self.disk_bytes + len(text) > self.max_disk_bytes:
+                return
+            self.disk_bytes += len(text)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        write_text(file, text)
+
+    def stats(self):
+        with self.lock:
+            asked = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / asked if asked else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self.disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'version': self.current
+            }
+
+    def memoize(self, func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            version = self.version()
+            # Inputs like relayoutData are dicts, the key uses their JSON text
+            key = (version, func.__name__, json.dumps(args, sort_keys=True))
+            figure = self.get(key)
+            if figure is not None:
+                return figure
+            figure = func(*args)
+            with self.stage('cache'):
+                # Same encoding as the Dash responses. Imported here, plotly.io.json pulls in
+                # plotly.tools and IPython, a third of a second the worker boot doesn't need
+                from plotly.io.json import to_json_plotly
+                # The dict of the figure is what gets cached and returned, it keeps the NumPy
+                # arrays and Dash encodes it again without walking a graph object
+                if hasattr(figure, 'to_plotly_json'):
+                    figure = figure.to_plotly_json()
+                text = to_json_plotly(figure)
+                # A sync may have swapped the dataset while the figure was built
+                if self.version() == version:
+                    self.put(key, figure, len(text))
+                    if self.directory:
+                        self.write(key, text)
+            return figure
+
+        return wrapper
@@ -0,0 +1,13 @@
+import os
+
+
+# PRELOAD=1 imports the app once in the master and forks the workers once the events are
+# loaded, so they start with the table of the master instead of loading their own.
+# With SYNC_INTERVAL set, use SHARED_EVENTS too so every worker follows the same synced table
+preload_app = bool(int(os.environ.get('PRELOAD', 0)))
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        import app
+        app.store.wait(timeout=None)
@@ -0,0 +1,147 @@
+import json
+import time
+import logging
+import functools
+import threading
+import contextlib
+
+import flask
+
+
+log = logging.getLogger(__name__)
+
+
+#######################################
+########METRICS########################
+#######################################
+# Timings and sizes of the callbacks and of the ingest, kept per process and served at /metrics
+# in the Prometheus text format. Each gunicorn worker keeps its own numbers.
+# A callback is split in stages: filter (the index queries), build (the figure), cache (storing
+# it in the figure cache) and serialize (the JSON of the Dash response), plus the response bytes
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+def labels_text(labels, **extra):
+    labels = dict(labels, **extra)
+    return '{' + ','.join('{}="{}"'.format(key, value) for key, value in labels.items()) + '}' if labels else ''
+
+
+class Metrics:
+    def __init__(self, prefix='earthquake'):
+        self.prefix = prefix
+        self.histograms = {}
+        self.help = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # One JSON line per callback through this logger, off unless enabled
+        self.structured = False
+
+    def describe(self, name, text, buckets=SECONDS):
+        self.help[name] = (text, buckets)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.help[name][1])
+            self.histograms[key].observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # Part of the callback running in this thread, the rest of its time counts as build
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = getattr(self.local, 'stages', None)
+            if stages is not None:
+                stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    def callback(self, func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            self.local.stages = {}
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                end = time.perf_counter()
+                stages = self.local.stages
+                self.local.stages = None
+                stages['build'] = end - start - sum(stages.values())
+                # The serialization and the size are known once Dash has built the response
+                if flask.has_request_context():
+                    flask.g.callback = (func.__name__, end, stages)
+                else:
+                    self.record(func.__name__, stages)
+
+        return wrapper
+
+    def record(self, callback, stages, size=None):
+        for stage, seconds in stages.items():
+            self.observe('callback_seconds', seconds, callback=callback, stage=stage)
+        if size is not None:
+            self.observe('callback_response_bytes', size, callback=callback)
+        if self.structured:
+            log.info(json.dumps(dict({'callback': callback, 'bytes': size},
+                                     **{stage: round(seconds, 6) for stage, seconds in stages.items()})))
+
+    # after_request hook of the Flask server
+    def response(self, response):
+        found = flask.g.pop('callback', None)
+        if found is not None:
+            callback, end, stages = found
+            stages['serialize'] = time.perf_counter() - end
+            self.record(callback, stages, response.calculate_content_length())
+        return response
+
+    # gauges is a list of (name, type, help, value) read at the time of the scrape
+    def render(self, gauges=()):
+        lines = []
+        with self.lock:
+            for name, (text, _) in self.help.items():
+                full = '{}_{}'.format(self.prefix, name)
+                lines += ['# HELP {} {}'.format(full, text), '# TYPE {} histogram'.format(full)]
+                for (found, labels), histogram in self.histograms.items():
+                    if found != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append('{}_bucket{} {}'.format(full, labels_text(labels, le=bound), count))
+                    lines.append('{}_bucket{} {}'.format(full, labels_text(labels, le='+Inf'), histogram.count))
+                    lines.append('{}_sum{} {}'.format(full, labels_text(labels), histogram.sum))
+                    lines.append('{}_count{} {}'.format(full, labels_text(labels), histogram.count))
+        for name, kind, text, value in gauges:
+            full = '{}_{}'.format(self.prefix, name)
+            lines += ['# HELP {} {}'.format(full, text), '# TYPE {} {}'.format(full, kind),
+                      '{} {}'.format(full, float(value))]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Metrics()
+registry.describe('callback_seconds', 'Time spent in each stage of a Dash callback.')
+registry.describe('callback_response_bytes', 'Size of the Dash callback responses, before compression.', BYTES)
+registry.describe('ingest_seconds', 'Time spent in each stage of loading the events.')
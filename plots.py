@@ -0,0 +1,171 @@
+import base64
+
+import numpy as np
+import plotly.io as pio
+import plotly.graph_objects as go
+
+import data
+
+
+#######################################
+########FIGURES########################
+#######################################
+# Figures of the filtered event table. assets/filters.js builds the scatter, density and geo
+# figures in the browser when CLIENTSIDE_FILTERING is on, with the traces and layouts of
+# scatter(), density() and geo() here, a change to those needs the same change there. It draws
+# every event: the server figures differ, the scatter and the geo plot are decimated to
+# POINT_BUDGET points (decimated()) and the density map gets binned cells (density_cells()).
+ALERT_COLORS = dict(zip(data.ALERTS, ['green', '#d6c800', '#fa9602', 'red']))
+
+
+def alert_color(alert, value):
+    return ALERT_COLORS[alert] if value == 'all' else value
+
+
+# The figures of the server callbacks are built from NumPy arrays and skip the validation
+# of plotly, which checks and copies every value of every trace property. Arrays stay
+# arrays up to the JSON encoder (orjson, picked by plotly when installed) that writes them
+# without going through Python lists. Property names aren't checked, a typo is only seen in
+# the browser, and shorthands aren't expanded: titles go as title_text
+def figure(traces):
+    return go.Figure(data=traces, _validate=False)
+
+
+# datetime64[s] is written as 2021-09-30T23:50:01, like the validated figures did
+def seconds(column):
+    return column.to_numpy().astype('datetime64[s]')
+
+
+# Note on the decimated figures, total is the number of rows in view
+def decimated(fig, shown, total):
+    if total > shown:
+        fig.add_annotation(text='{:,} of {:,} earthquakes, zoom in to see all of them'.format(shown, total),
+                           xref='paper', yref='paper', x=1, y=1, xanchor='right', yanchor='bottom',
+                           showarrow=False, font_size=11)
+    return fig
+
+
+# window is the [start, end) of a date window other than the one of the store
+def scatter(temp, value1, value3, window=None):
+    # Same as px.scatter(size='cdi'): one trace per alert, webgl above 1000 points
+    sizeref = float(temp.cdi.max()) / 20 ** 2 if len(temp) else 1
+    kind = 'scattergl' if len(temp) > 1000 else 'scatter'
+    alerts = temp.alert.to_numpy()
+    times = seconds(temp.time)
+    magnitude, cdi, location = temp.magnitude.to_numpy(), temp.cdi.to_numpy(), temp.location.to_numpy()
+    traces = []
+    for alert in data.ALERTS:
+        rows = alerts == alert
+        if not rows.any():
+            continue
+        traces.append(dict(
+            type = kind, x = times[rows], y = magnitude[rows], hovertext = location[rows].tolist(), mode = 'markers',
+            name = alert, legendgroup = alert, showlegend = True,
+            marker = dict(color=alert_color(alert, value1), size=cdi[rows], sizemode='area', sizeref=sizeref, symbol='circle'),
+            hovertemplate = '<b>%{hovertext}</b><br><br>alert=' + alert + '<br>time=%{x}<br>magnitude=%{y}<br>cdi=%{marker.size}<extra></extra>'
+        ))
+    fig = figure(traces)
+    fig.update_layout(xaxis_title_text='time', yaxis_title_text='magnitude', legend_title_text='alert', legend_tracegroupgap=0,
+                      legend_itemsizing='constant', margin_t=60)
+    fig.update_layout(yaxis_range=[0,9], xaxis_range=x_range(value3, window))
+    # A zoom of the user stays in place when the refined points come in
+    fig.update_layout(uirevision='scatter')
+    return fig
+
+
+# A quarter of margin before the window, up to the end of the year of the slider
+def x_range(value3, window):
+    if window is None:
+        return ['2009-10-01T00:00:00', '{}-{}-30T00:00:00'.format(value3, '03' if value3 == 2022 else 12)]
+    start, end = window
+    last = min(np.datetime64('{}-12-30'.format(value3), 's'), end + np.timedelta64(90, 'D'))
+    return [str(start - np.timedelta64(92, 'D')), str(last)]
+
+
+def density(temp, value1, value2):
+    # The whole catalog is dense enough with a smaller radius
+    radius = 5 if value1 == 'all' and value2 == 'default' else 7
+    fig = go.Figure(go.Densitymapbox(
+        lat = temp.longitud, lon = temp.latitud, z = temp.magnitude, radius = radius,
+        hovertext = temp.location, name = '', coloraxis = 'coloraxis',
+        hovertemplate = '<b>%{hovertext}</b><br><br>magnitude=%{z}<br>longitud=%{lat}<br>latitud=%{lon}<extra></extra>'
+    ))
+    fig.update_layout(mapbox_center=dict(lat=7, lon=37), mapbox_zoom=0.5, mapbox_style="stamen-terrain",
+                      coloraxis_colorbar_title='magnitude',
+                      coloraxis_colorscale=pio.templates[pio.templates.default].layout.colorscale.sequential,
+                      legend_tracegroupgap=0, margin_t=60)
+    return fig
+
+
+# The density map from the binned cells of query.EventIndex.density. uirevision keeps the
+# view of the user when a new set of cells comes in after a pan or a zoom
+def density_cells(cells, value1, value2):
+    radius = 5 if value1 == 'all' and value2 == 'default' else 7
+    fig = figure([dict(
+        type = 'densitymapbox', lat = cells['lat'], lon = cells['lon'], z = cells['z'], radius = radius,
+        customdata = cells['count'], name = '', coloraxis = 'coloraxis',
+        hovertemplate = '%{customdata} earthquakes<br>magnitude sum=%{z:.1f}<extra></extra>'
+    )])
+    fig.update_layout(mapbox_center=dict(lat=7, lon=37), mapbox_zoom=0.5, mapbox_style="stamen-terrain",
+                      coloraxis_colorbar_title_text='magnitude',
+                      coloraxis_colorscale=pio.templates[pio.templates.default].layout.colorscale.sequential,
+                      legend_tracegroupgap=0, margin_t=60, uirevision='density')
+    return fig
+
+
+def geo(temp):
+    fig = figure([dict(
+        type = 'scattergeo',
+        lon = temp.latitud.to_numpy(),
+        lat = temp.longitud.to_numpy(),
+        text = temp.location.tolist(),
+        mode = 'markers',
+        marker = dict(color=temp.alert.astype(str).tolist())
+        )])
+    fig.update_layout(
+        autosize=False,
+        margin=dict(
+            l=0,
+            r=0,
+            b=0,
+            t=0,
+            pad=90
+        ),
+        uirevision='geo'
+    )
+    return fig
+
+
+#######################################
+########SNAPSHOT#######################
+#######################################
+# The whole event table for the browser, numeric columns as base64 little-endian buffers
+# that assets/filters.js reads as typed arrays
+def encode(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode()
+
+
+# float32 columns go as the float64 of their shortest text (4.2, not 4.199999809),
+# the same numbers the server figures show
+def shortest(column):
+    return column.to_numpy().astype(str).astype(float)
+
+
+def snapshot(index):
+    df2 = index.df
+    return {
+        'version': index.version,
+        'rows': len(df2),
+        'time': encode(df2.time.to_numpy().astype('datetime64[ms]').astype(np.int64), '<f8'),
+        'magnitude': encode(shortest(df2.magnitude), '<f8'),
+        'cdi': encode(shortest(df2.cdi), '<f8'),
+        'latitud': encode(shortest(df2.latitud), '<f8'),
+        'longitud': encode(shortest(df2.longitud), '<f8'),
+        'alert': encode(df2.alert.cat.codes.to_numpy(), '<i1'),
+        'tsunami': encode(df2.tsunami.cat.codes.to_numpy(), '<i1'),
+        'location': df2.location.tolist(),
+        'alerts': list(df2.alert.cat.categories),
+        'tsunamis': [int(value) for value in df2.tsunami.cat.categories],
+        'colors': ALERT_COLORS,
+        'template': pio.templates[pio.templates.default].to_plotly_json()
+    }
@@ -0,0 +1,309 @@
+import numpy as np
+
+
+#######################################
+########FILTER INDEX###################
+#######################################
+# Row positions of the event table for every (alert, tsunami) pair the filters can ask for,
+# 'all' and 'default' included. Each pair keeps its rows sorted by time and sorted by sig,
+# so a year range or a sig maximum is two binary searches and a slice.
+class Cell:
+    def __init__(self, positions, times, sigs):
+        order = np.argsort(times[positions], kind='stable')
+        self.by_time = positions[order]
+        self.times = times[self.by_time]
+        order = np.argsort(sigs[positions], kind='stable')
+        self.by_sig = positions[order]
+        self.sigs = sigs[self.by_sig]
+
+
+# Quantiles the way plotly.js interpolates them (Lib.interp): position p * n - 0.5 in the
+# sorted values, clamped to the first and the last one. Not NumPy's default p * (n - 1)
+def interp(ordered, shares):
+    at = np.clip(np.asarray(shares) * len(ordered) - 0.5, 0, len(ordered) - 1)
+    low, high = np.floor(at).astype(np.int64), np.ceil(at).astype(np.int64)
+    frac = at - low
+    return frac * ordered[high] + (1 - frac) * ordered[low]
+
+
+# Quartiles and whiskers the way plotly computes them in the browser, points past the
+# whiskers are sent as outliers
+def box_stats(values):
+    ordered = np.sort(values.astype(np.float64))
+    q1, median, q3 = interp(ordered, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = ordered[(ordered >= q1 - 1.5 * iqr) & (ordered <= q3 + 1.5 * iqr)]
+    lowerfence, upperfence = min(q1, inside.min()), max(q3, inside.max())
+    # Python floats, NumPy scalars would send the JSON encoder down its slow path
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(lowerfence),
+        'upperfence': float(upperfence),
+        'outliers': values[(values < lowerfence) | (values > upperfence)]
+    }
+
+
+#######################################
+########SPATIAL BINS###################
+#######################################
+# Density map cells, level 0 cells are 8 degrees wide and every level halves them
+BASE_DEGREES = 8.0
+MAX_LEVEL = 8
+DEFAULT_ZOOM = 0.5
+
+
+def cell_size(level):
+    return BASE_DEGREES / 2 ** level
+
+
+# Cells about 8 pixels wide on screen, a mapbox world is 512 pixels wide at zoom 0
+def zoom_level(zoom):
+    return int(np.clip(round(zoom + 0.5), 0, MAX_LEVEL))
+
+
+def cell_ids(lon, lat, level):
+    size = cell_size(level)
+    ix = np.floor((lon + 180) / size).astype(np.int64)
+    iy = np.floor((lat + 90) / size).astype(np.int64)
+    return iy * (int(360 / size) + 1) + ix
+
+
+# Events of one cell are summed at their mean position, z is the sum of their magnitudes.
+# Positions are rounded to about 100 m, more digits only make the response bigger
+def grid(lon, lat, weight, level):
+    ids, inverse = np.unique(cell_ids(lon, lat, level), return_inverse=True)
+    count = np.bincount(inverse)
+    return {
+        'lon': np.round(np.bincount(inverse, lon, len(ids)) / count, 3),
+        'lat': np.round(np.bincount(inverse, lat, len(ids)) / count, 3),
+        'z': np.round(np.bincount(inverse, weight, len(ids)), 2),
+        'count': count
+    }
+
+
+# Zoom level and (west, east, south, north) bounds of the map from its view: every relayoutData
+# of the graph merged, see assets/view.js.
+# Bounds are padded by half the view and snapped to the cell grid so nearby views share
+# their cache entry, None means the whole world is in view
+def map_view(relayout):
+    relayout = relayout or {}
+    level = zoom_level(relayout.get('mapbox.zoom', DEFAULT_ZOOM))
+    corners = relayout.get('mapbox._derived', {}).get('coordinates')
+    if not corners:
+        return level, None
+    lons = [corner[0] for corner in corners]
+    lats = [corner[1] for corner in corners]
+    west, east, south, north = min(lons), max(lons), min(lats), max(lats)
+    if east - west >= 180:
+        return level, None
+    step = cell_size(level) * 4
+    pad_x, pad_y = (east - west) / 2, (north - south) / 2
+    west = np.floor((west - pad_x) / step) * step
+    east = np.ceil((east + pad_x) / step) * step
+    south = max(-90.0, np.floor((south - pad_y) / step) * step)
+    north = min(90.0, np.ceil((north + pad_y) / step) * step)
+    # Longitudes past the antimeridian are brought back to -180..180, then west > east
+    west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+    return level, (float(west), float(east), float(south), float(north))
+
+
+def inside(lon, lat, bounds):
+    west, east, south, north = bounds
+    found = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+    return found & (lat >= south) & (lat <= north)
+
+
+def in_view(cells, bounds):
+    if bounds is None:
+        return cells
+    found = inside(cells['lon'], cells['lat'], bounds)
+    return {name: values[found] for name, values in cells.items()}
+
+
+#######################################
+########DECIMATION#####################
+#######################################
+# Past a point budget the scatter plots get a representative subset of the rows in view.
+# Most alerted events are past the sig of 600 of the USGS significant feed, here the large
+# ones are 1000 and up. They are always kept, the most significant half of the budget at most
+SIGNIFICANT_SIG = 1000
+
+
+def significant(sigs, budget):
+    order = np.argsort(-sigs, kind='stable')[:budget // 2]
+    keep = np.zeros(len(sigs), dtype=bool)
+    keep[order[sigs[order] >= SIGNIFICANT_SIG]] = True
+    return keep
+
+
+# Indices of the lowest and the highest value of every group
+def extremes(groups, values):
+    order = np.lexsort((values, groups))
+    groups = groups[order]
+    edges = groups[1:] != groups[:-1]
+    return order[np.r_[True, edges] | np.r_[edges, True]]
+
+
+# Index of the largest value of every group
+def largest(groups, values):
+    order = np.lexsort((-values, groups))
+    groups = groups[order]
+    return order[np.r_[True, groups[1:] != groups[:-1]]]
+
+
+# (start, end, low, high) of the time x magnitude scatter from its merged relayoutData, dates as
+# plotly writes them. None when that side is not zoomed
+def axis_view(relayout):
+    relayout = relayout or {}
+    view = []
+    for axis in ['xaxis', 'yaxis']:
+        found = relayout.get(axis + '.range') or [relayout.get(axis + '.range[0]'), relayout.get(axis + '.range[1]')]
+        view.extend(sorted(found) if None not in found else [None, None])
+    return tuple(view) if any(value is not None for value in view) else None
+
+
+# (west, east, south, north) seen by the geo plot from its merged relayoutData, padded by half the
+# view. Keys never sent keep the plotly defaults, scale 1 centred on (0, 0).
+# The geo plot is equirectangular, at scale s it shows 360 / s degrees of longitude
+def geo_view(relayout):
+    relayout = relayout or {}
+    scale = relayout.get('geo.projection.scale', 1)
+    # Below 2 the padded view is the whole world
+    if scale <= 2:
+        return None
+    lon = relayout.get('geo.center.lon', 0)
+    lat = relayout.get('geo.center.lat', 0)
+    width, height = 360 / scale, 180 / scale
+    west, east = lon - width, lon + width
+    west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+    return float(west), float(east), float(max(-90, lat - height)), float(min(90, lat + height))
+
+
+def parse_date(text):
+    return np.datetime64(text.replace(' ', 'T'))
+
+
+# [start, end) of a date picker range, the picker gives the last day shown and no end
+# date is up to today. A start before earliest is moved up to it. None when the range is empty
+def date_window(start_date, end_date, earliest=None):
+    start = np.datetime64(start_date[:10], 's')
+    if earliest is not None:
+        start = max(start, np.datetime64(earliest[:10], 's'))
+    end = np.datetime64(end_date[:10] if end_date else 'today', 'D') + np.timedelta64(1, 'D')
+    return (start, end.astype('datetime64[s]')) if start < end else None
+
+
+class EventIndex:
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version
+        times = df.time.to_numpy()
+        sigs = df.sig.to_numpy()
+        alerts = df.alert.to_numpy()
+        tsunamis = df.tsunami.to_numpy()
+        positions = np.arange(len(df), dtype=np.int32)
+        self.cells = {}
+        for alert in ['all'] + list(df.alert.cat.categories):
+            for tsunami in ['default'] + list(df.tsunami.cat.categories):
+                mask = np.ones(len(df), dtype=bool)
+                if alert != 'all':
+                    mask &= alerts == alert
+                if tsunami != 'default':
+                    mask &= tsunamis == tsunami
+                self.cells[alert, tsunami] = Cell(positions[mask], times, sigs)
+
+        # Summaries of the bar chart and the box plot, computed once per dataset version
+        years = df.time.dt.year.to_numpy()
+        self.year_counts = {key: np.unique(years[cell.by_time], return_counts=True)
+                            for key, cell in self.cells.items()}
+        magnitudes = df.magnitude.to_numpy()
+        self.boxes = {alert: box_stats(magnitudes[self.cells[alert, 'default'].by_time])
+                      for alert in df.alert.cat.categories if len(self.cells[alert, 'default'].by_time)}
+
+        # Density grids are built the first time a filter and zoom level is asked for
+        self.grids = {}
+
+    # Positions of the rows matching the filters, in table order so the plots keep their colors.
+    # years is an inclusive (first, last) pair, either side can be None
+    def positions(self, alert='all', tsunami='default', years=None, sig_max=None):
+        cell = self.cells[alert, tsunami]
+        if years is not None:
+            first, last = years
+            start = 0 if first is None else np.searchsorted(cell.times, np.datetime64('{}-01-01'.format(first)))
+            end = len(cell.times) if last is None else np.searchsorted(cell.times, np.datetime64('{}-01-01'.format(last + 1)))
+            found = cell.by_time[start:end]
+            if sig_max is not None:
+                found = found[self.df.sig.to_numpy()[found] <= sig_max]
+        elif sig_max is not None:
+            found = cell.by_sig[:np.searchsorted(cell.sigs, sig_max, side='right')]
+        else:
+            found = cell.by_time
+        return np.sort(found)
+
+    def query(self, alert='all', tsunami='default', years=None, sig_max=None):
+        return self.df.iloc[self.positions(alert, tsunami, years, sig_max)]
+
+    # Density cells of the filtered events at a zoom level, only the ones inside bounds.
+    # The latitud column holds the longitudes and longitud the latitudes
+    def density(self, alert, tsunami, level, bounds=None):
+        key = (alert, tsunami, level)
+        if key not in self.grids:
+            rows = self.cells[alert, tsunami].by_time
+            self.grids[key] = grid(self.df.latitud.to_numpy()[rows].astype(float),
+                                   self.df.longitud.to_numpy()[rows].astype(float),
+                                   self.df.magnitude.to_numpy()[rows].astype(float), level)
+        return in_view(self.grids[key], bounds)
+
+    # Rows of the time x magnitude scatter inside view (see axis_view) and how many rows are in view.
+    # Past the budget every time bucket keeps its lowest and highest magnitude, per alert so no
+    # color goes missing
+    def sample_series(self, alert, tsunami, years, view, budget):
+        found = self.positions(alert, tsunami, years)
+        if view is not None:
+            start, end, low, high = view
+            if start is not None:
+                times = self.df.time.to_numpy()[found]
+                found = found[(times >= parse_date(start)) & (times <= parse_date(end))]
+            if low is not None:
+                magnitudes = self.df.magnitude.to_numpy()[found]
+                found = found[(magnitudes >= low) & (magnitudes <= high)]
+        if len(found) <= budget:
+            return found, len(found)
+        kept = significant(self.df.sig.to_numpy()[found], budget)
+        rest = found[~kept]
+        codes = self.df.alert.cat.codes.to_numpy()[rest].astype(np.int64)
+        times = self.df.time.to_numpy()[rest].astype(np.int64)
+        buckets = max(1, (budget - kept.sum()) // (2 * len(np.unique(codes))))
+        span = float(times.max() - times.min()) + 1
+        bucket = ((times - times.min()) / span * buckets).astype(np.int64)
+        picked = rest[extremes(codes * buckets + bucket, self.df.magnitude.to_numpy()[rest])]
+        return np.sort(np.concatenate([found[kept], picked])), len(found)
+
+    # Rows of the geo plot inside bounds and how many rows are in bounds. Past the budget the map
+    # is cut in cells, as fine as the budget allows, and each cell keeps its most significant event
+    def sample_map(self, alert, tsunami, bounds, budget):
+        found = self.positions(alert, tsunami)
+        lon = self.df.latitud.to_numpy()[found]
+        lat = self.df.longitud.to_numpy()[found]
+        if bounds is not None:
+            visible = inside(lon, lat, bounds)
+            found, lon, lat = found[visible], lon[visible], lat[visible]
+        if len(found) <= budget:
+            return found, len(found)
+        sigs = self.df.sig.to_numpy()[found]
+        kept = significant(sigs, budget)
+        rest, lon, lat, sigs = found[~kept], lon[~kept], lat[~kept], sigs[~kept]
+        cells = cell_ids(lon, lat, 0)
+        for level in range(1, MAX_LEVEL + 1):
+            finer = cell_ids(lon, lat, level)
+            if len(np.unique(finer)) > budget - kept.sum():
+                break
+            cells = finer
+        picked = largest(cells, sigs)
+        # Even the coarsest cells can outnumber a small budget, the most significant of them stay
+        room = budget - kept.sum()
+        if len(picked) > room:
+            picked = picked[np.argsort(-sigs[picked], kind='stable')[:room]]
+        return np.sort(np.concatenate([found[kept], rest[picked]])), len(found)
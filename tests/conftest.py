@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+import tempfile
+
+import pytest
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# data.py reads these at import, nothing in the tests may reach the real USGS endpoint
+os.environ.setdefault('USGS_URL', 'http://127.0.0.1:9/fdsnws/event/1/query?')
+os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='earthquake-test-cache-'))
+
+import data  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.fake_usgs import FakeUSGS  # noqa: E402
+
+
+# Canned GeoJSON features: n synthetic events, with the given times (ISO dates) when set
+def features(n, times=None, alert='green', seed=0):
+    rnd = random.Random(seed)
+    found = [synthetic.feature(rnd, i, alert) for i in range(n)]
+    for feature, time in zip(found, times or []):
+        feature['properties']['time'] = int(pd.Timestamp(time).value // 10 ** 6)
+    return found
+
+
+# A cleaned event table with no red tsunami events, so one cell of the index is empty,
+# and some events of sig 0 to check the edge of sig_max=0
+@pytest.fixture(scope='module')
+def table():
+    catalog = synthetic.catalog(4000, seed=3)
+    df = data.concat([data.normalize({'features': [f for f in catalog if f['properties']['alert'] == alert]})
+                      for alert in data.ALERTS])
+    df = df[~((df.alert == 'red') & (df.tsunami == 1))].reset_index(drop=True)
+    df.loc[::40, 'sig'] = 0
+    return data.clean(df)
+
+
+# The stand-in USGS endpoint serving features, the fetches of data.py go to it. Retries don't back off
+@pytest.fixture
+def usgs(monkeypatch):
+    servers = []
+
+    def start(found, **options):
+        server = FakeUSGS(found, **options).start()
+        servers.append(server)
+        monkeypatch.setattr(data, 'path', server.url)
+        monkeypatch.setattr(data, 'session', data.make_session(backoff=0))
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import data
+from conftest import features
+
+
+def table(n=3):
+    return data.normalize({'features': features(n, ['2010-02-01', '2010-02-10', '2010-02-20'][:n])})
+
+
+def test_write_feather_leaves_no_temporary_file(tmp_path):
+    file = str(tmp_path / 'events.feather')
+    data.write_feather(table(), file)
+    assert os.listdir(tmp_path) == ['events.feather']
+    assert list(pd.read_feather(file).id) == list(table().id)
+
+
+def test_write_text_replaces_the_file(tmp_path):
+    file = str(tmp_path / 'current')
+    data.write_text(file, 'a')
+    data.write_text(file, 'b')
+    assert open(file).read() == 'b'
+    assert os.listdir(tmp_path) == ['current']
+
+
+# A file from before a column was added is a miss for the store cache and the partitions alike
+def test_old_files_are_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'CACHE_DIR', str(tmp_path))
+    old = table().drop(columns=['depth'])
+    data.write_feather(old, data.cache_file('2010-01-01', '2011-01-01', 'green'))
+    assert data.read_alert('2010-01-01', '2011-01-01', 'green') is None
+
+    partitions = data.Partitions(folder=str(tmp_path / 'months'))
+    os.makedirs(partitions.folder)
+    month = pd.Timestamp('2010-02-01')
+    data.write_feather(old, data.month_file(partitions.folder, month))
+    assert partitions.read(month) == (None, None)
+    data.write_feather(table(), data.month_file(partitions.folder, month))
+    df, _ = partitions.read(month)
+    assert len(df) == 3
+
+
+# Threads of one worker writing the same file each get their own temporary file
+def test_threads_writing_one_file(tmp_path):
+    file = str(tmp_path / 'figure.json')
+    texts = [str(i) * 10000 for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda text: [data.write_text(file, text) for _ in range(20)], texts))
+    assert open(file).read() in texts
+    assert os.listdir(tmp_path) == ['figure.json']
+
+
+def test_failed_write_removes_its_temporary_file(tmp_path):
+    def fail(tmp):
+        open(tmp, 'w').write('half')
+        raise OSError('disk full')
+    with pytest.raises(OSError):
+        data.replace_file(str(tmp_path / 'events.feather'), fail)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+import query
+
+
+@pytest.fixture(scope='module')
+def index(table):
+    return query.EventIndex(table)
+
+
+def significant_rows(index, found):
+    return set(found[index.df.sig.to_numpy()[found] >= query.SIGNIFICANT_SIG])
+
+
+@pytest.mark.parametrize('budget', [100, 400, 1000])
+def test_series_within_budget_and_every_alert_kept(index, budget):
+    every = index.positions()
+    found, total = index.sample_series('all', 'default', (None, 2022), None, budget)
+    assert total == len(every)
+    assert len(found) <= budget
+    assert set(found) <= set(every)
+    assert np.all(np.diff(found) > 0)
+    assert set(index.df.alert.iloc[found]) == set(index.df.alert.iloc[every])
+
+
+def test_series_keeps_significant_up_to_half_the_budget(index):
+    every = index.positions()
+    sigs = index.df.sig.to_numpy()
+    strong = significant_rows(index, every)
+    # Under the cap every significant event is kept
+    found, _ = index.sample_series('all', 'default', None, None, 2 * len(strong) + 100)
+    assert strong <= set(found)
+    # Over it the most significant half of the budget is
+    budget = len(strong)
+    found, _ = index.sample_series('all', 'default', None, None, budget)
+    cap = sorted(sigs[list(strong)], reverse=True)[budget // 2 - 1]
+    assert {row for row in strong if sigs[row] > cap} <= set(found)
+
+
+def test_zoomed_series_returns_every_row_in_view(index):
+    view = ('2015-01-01 00:00:00', '2015-03-31 23:59:59', None, None)
+    found, total = index.sample_series('all', 'default', None, view, 4000)
+    times = index.df.time
+    expected = np.flatnonzero((times >= '2015-01-01') & (times <= '2015-03-31 23:59:59'))
+    assert np.array_equal(found, expected) and total == len(expected)
+    view = (None, None, 5.0, 6.0)
+    found, _ = index.sample_series('green', 'default', None, view, 4000)
+    magnitudes = index.df.magnitude
+    expected = np.flatnonzero((index.df.alert == 'green') & (magnitudes >= 5) & (magnitudes <= 6))
+    assert np.array_equal(found, expected)
+
+
+@pytest.mark.parametrize('budget', [100, 400, 1000])
+def test_map_within_budget(index, budget):
+    every = index.positions()
+    found, total = index.sample_map('all', 'default', None, budget)
+    assert total == len(every)
+    assert len(found) <= budget
+    strong = significant_rows(index, every)
+    assert len(strong & set(found)) >= min(len(strong), budget // 2)
+
+
+def test_map_in_bounds_returns_every_row(index):
+    # Across the antimeridian, west > east
+    bounds = (170.0, -170.0, -30.0, 0.0)
+    found, total = index.sample_map('all', 'default', bounds, 4000)
+    lon, lat = index.df.latitud.to_numpy(), index.df.longitud.to_numpy()
+    expected = np.flatnonzero(((lon >= 170) | (lon <= -170)) & (lat >= -30) & (lat <= 0))
+    assert len(expected) > 0
+    assert np.array_equal(found, expected) and total == len(expected)
+
+
+def test_map_view_world_and_zoom():
+    assert query.map_view(None) == (1, None)
+    level, bounds = query.map_view({'mapbox.zoom': 4, 'mapbox._derived': {
+        'coordinates': [[130, 42], [148, 42], [148, 30], [130, 30]]}})
+    assert level == 4
+    west, east, south, north = bounds
+    # Padded by half the view and snapped to 4 cells of the level
+    assert west <= 121 and east >= 157 and south <= 24 and north >= 48
+    assert all(value % (query.cell_size(4) * 4) == 0 for value in bounds)
+
+
+def test_map_view_across_the_antimeridian():
+    level, bounds = query.map_view({'mapbox.zoom': 4, 'mapbox._derived': {
+        'coordinates': [[172, -10], [188, -10], [188, -25], [172, -25]]}})
+    west, east, south, north = bounds
+    assert west > east
+    assert -180 <= east < 0 < west <= 180
+    lon = np.array([175.0, -175.0, 0.0])
+    lat = np.array([-18.0, -18.0, -18.0])
+    assert list(query.inside(lon, lat, bounds)) == [True, True, False]
+
+
+def test_grid_sums_cells():
+    lon = np.array([1.0, 3.0, 100.0])
+    lat = np.array([1.0, 3.0, 50.0])
+    cells = query.grid(lon, lat, np.array([4.0, 5.0, 6.0]), 0)
+    order = np.argsort(cells['lon'])
+    assert list(cells['count'][order]) == [2, 1]
+    assert list(cells['lon'][order]) == [2.0, 100.0]
+    assert list(cells['lat'][order]) == [2.0, 50.0]
+    assert list(cells['z'][order]) == [9.0, 6.0]
+
+
+def test_density_in_view(index):
+    cells = index.density('all', 'default', 0)
+    assert cells['count'].sum() == len(index.df)
+    bounds = (120.0, 160.0, 20.0, 50.0)
+    inside = index.density('all', 'default', 0, bounds)
+    assert 0 < inside['count'].sum() < len(index.df)
+    assert np.all(query.inside(inside['lon'], inside['lat'], bounds))
@@ -0,0 +1,57 @@
+import pytest
+import requests
+
+import data
+from conftest import features
+
+
+def test_windows_split_on_month_starts():
+    found = data.windows('2010-01-01', '2012-06-15', months=12)
+    assert found == [('2010-01-01T00:00:00', '2011-01-01T00:00:00'),
+                     ('2011-01-01T00:00:00', '2012-01-01T00:00:00'),
+                     ('2012-01-01T00:00:00', '2012-06-15T00:00:00')]
+
+
+def test_windows_without_chunks_is_one_window():
+    assert data.windows('2010-03-05', '2010-04-01', months=0) == [('2010-03-05T00:00:00', '2010-04-01T00:00:00')]
+
+
+def test_fetch_joins_windows_and_dedupes_edges(usgs):
+    # The second event is on the edge of the two windows, both queries return it
+    times = ['2010-06-01', '2011-01-01', '2011-07-01']
+    server = usgs(features(3, times))
+    found = data.fetch('2010-01-01', '2012-01-01', alerts=['green'], months=12)
+    assert server.requests == 2
+    assert sorted(f['id'] for f in found['green']['features']) == ['syn00000000', 'syn00000001', 'syn00000002']
+
+
+def test_fetch_keeps_alerts_apart(usgs):
+    usgs(features(2, ['2010-02-01', '2010-03-01'], alert='green') + features(1, ['2010-04-01'], alert='red', seed=1))
+    found = data.fetch('2010-01-01', '2011-01-01', alerts=['green', 'red'], months=12)
+    assert len(found['green']['features']) == 2
+    assert len(found['red']['features']) == 1
+
+
+def test_retries_429_and_503(usgs):
+    server = usgs(features(3, ['2010-02-01', '2010-03-01', '2010-04-01']), failures=2)
+    found = data.earthquake(data.path, '2010-01-01', '2011-01-01', 'green')
+    assert server.requests == 3
+    assert len(found['features']) == 3
+
+
+def test_fails_once_retries_run_out(usgs):
+    server = usgs(features(1, ['2010-02-01']), error_rate=1)
+    with pytest.raises(requests.exceptions.RetryError):
+        data.earthquake(data.path, '2010-01-01', '2011-01-01', 'green')
+    # The first try and the 5 retries of make_session
+    assert server.requests == 6
+
+
+def test_earthquake_parses_bytes(usgs):
+    canned = features(1, ['2010-02-01'])
+    canned[0]['properties']['place'] = '12 km SSO de Ciudad Hidalgo, México'
+    usgs(canned)
+    found = data.earthquake(data.path, '2010-01-01', '2011-01-01', 'green')
+    assert found['type'] == 'FeatureCollection'
+    assert found['metadata']['count'] == 1
+    assert found['features'][0]['properties']['place'] == '12 km SSO de Ciudad Hidalgo, México'
@@ -0,0 +1,60 @@
+import os
+import time
+
+import figure_cache
+from figure_cache import FigureCache
+
+OLD = 'aaaaaaaaaaaaaaaa'
+NEW = 'bbbbbbbbbbbbbbbb'
+
+
+def cache(directory, version, **options):
+    current = {'version': version}
+    found = FigureCache(lambda: current['version'], directory=str(directory), **options)
+    return found, current
+
+
+def figure(value1):
+    return {'data': [{'type': 'bar', 'x': [value1], 'y': [1]}], 'layout': {}}
+
+
+def age(folder, seconds):
+    stamp = time.time() - seconds
+    os.utime(folder, (stamp, stamp))
+
+
+def test_new_version_removes_only_old_version_folders(tmp_path):
+    for name in ['shared', 'months']:
+        (tmp_path / name).mkdir()
+    built, current = cache(tmp_path, OLD)
+    build = built.memoize(figure)
+    build('a')
+    assert os.listdir(tmp_path / 'figures' / OLD)
+    (tmp_path / 'figures' / 'notes').mkdir()
+    age(tmp_path / 'figures' / OLD, figure_cache.PRUNE_AFTER + 1)
+    current['version'] = NEW
+    build('a')
+    assert sorted(os.listdir(tmp_path / 'figures')) == [NEW, 'notes']
+    assert sorted(name for name in os.listdir(tmp_path) if name != 'figures') == ['months', 'shared']
+
+
+# Another worker may not have synced yet, its folder was written to a moment ago
+def test_recent_version_folders_are_kept(tmp_path):
+    built, current = cache(tmp_path, OLD)
+    build = built.memoize(figure)
+    build('a')
+    current['version'] = NEW
+    build('a')
+    assert sorted(os.listdir(tmp_path / 'figures')) == [OLD, NEW]
+
+
+def test_disk_side_stops_at_its_budget(tmp_path):
+    built, _ = cache(tmp_path, OLD, max_disk_bytes=250)
+    build = built.memoize(figure)
+    for value in 'abcdef':
+        build(value)
+    files = os.listdir(tmp_path / 'figures' / OLD)
+    assert 0 < len(files) < 6
+    assert sum(os.path.getsize(tmp_path / 'figures' / OLD / name) for name in files) <= 250
+    # The memory part still has every figure
+    assert built.stats()['entries'] == 6
@@ -0,0 +1,58 @@
+import time
+
+import data
+from conftest import features
+
+
+def partitions(tmp_path, seed=('2010-01-01', '2011-01-01')):
+    return data.Partitions(seed=seed, folder=str(tmp_path / 'months'))
+
+
+# Calls window until every month of it is on disk, the backfill runs in the background
+def loaded(found, start, end, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        index, have, wanted = found.window(start, end)
+        if have == wanted or time.time() > deadline:
+            return index, have, wanted
+        time.sleep(0.05)
+
+
+# A window from 1900 would queue over 1,500 months of backfill, only the ones from EARLIEST are fetched
+def test_window_starts_at_earliest(usgs, tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'EARLIEST', '2000-01-01')
+    server = usgs(features(2, ['1999-12-15', '2000-01-15']))
+    found = partitions(tmp_path)
+    index, have, wanted = loaded(found, '1900-01-01', '2000-03-01')
+    assert (have, wanted) == (2, 2)
+    assert server.requests == 2 * len(data.ALERTS)
+    assert list(index.df.time.dt.year) == [2000]
+    assert found.window('1900-01-01', '2000-01-01')[1:] == (0, 0)
+
+
+# Months outside the seed are fetched, the window is served with the ones there are meanwhile
+def test_window_outside_the_seed_grows_to_complete(usgs, tmp_path):
+    server = usgs(features(3, ['2012-01-10', '2012-02-10', '2012-03-10']), latency=0.05)
+    found = partitions(tmp_path)
+    index, have, wanted = found.window('2012-01-01', '2012-04-01')
+    assert (have, wanted) == (0, 3)
+    assert len(index.df) == 0
+    index, have, wanted = loaded(found, '2012-01-01', '2012-04-01')
+    assert (have, wanted) == (3, 3)
+    assert len(index.df) == 3
+    assert server.requests == 3 * len(data.ALERTS)
+
+
+# Months inside the seed come from the cache files of the event store, USGS is not asked again
+def test_window_inside_the_seed_is_split_from_the_cache(usgs, tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'CACHE_DIR', str(tmp_path))
+    server = usgs(features(3, ['2010-02-10', '2010-03-10', '2010-08-10']))
+    data.EventStore('2010-01-01', '2011-01-01').load()
+    requests = server.requests
+    found = partitions(tmp_path)
+    index, have, wanted = loaded(found, '2010-02-01', '2010-04-01')
+    assert (have, wanted) == (2, 2)
+    assert len(index.df) == 2
+    assert server.requests == requests
+    assert len(found.window('2010-01-01', '2011-01-01')[0].df) == 3
+    assert server.requests == requests
@@ -0,0 +1,95 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import data
+import query
+
+ALERTS = ['all'] + data.ALERTS
+TSUNAMIS = ['default', 0, 1]
+YEARS = [None, (None, 2015), (2012, None), (2013, 2013), (None, 2022), (2030, 2031)]
+SIG_MAXES = [None, 0, 300, 5000]
+
+
+def masked(df, alert, tsunami, years, sig_max):
+    mask = np.ones(len(df), dtype=bool)
+    if alert != 'all':
+        mask &= df.alert == alert
+    if tsunami != 'default':
+        mask &= df.tsunami == tsunami
+    if years is not None:
+        first, last = years
+        year = df.time.dt.year
+        if first is not None:
+            mask &= year >= first
+        if last is not None:
+            mask &= year <= last
+    if sig_max is not None:
+        mask &= df.sig <= sig_max
+    return np.flatnonzero(mask)
+
+
+def test_index_matches_masks(table):
+    index = query.EventIndex(table)
+    assert len(index.cells['red', 1].by_time) == 0
+    assert len(index.positions(sig_max=0)) > 0
+    for alert, tsunami, years, sig_max in itertools.product(ALERTS, TSUNAMIS, YEARS, SIG_MAXES):
+        expected = masked(table, alert, tsunami, years, sig_max)
+        found = index.positions(alert, tsunami, years, sig_max)
+        assert np.array_equal(found, expected), (alert, tsunami, years, sig_max)
+
+
+def test_query_keeps_table_order(table):
+    index = query.EventIndex(table)
+    found = index.query('green', 0, (2011, 2014), 500)
+    assert found.index.is_monotonic_increasing
+    assert found.equals(table.iloc[masked(table, 'green', 0, (2011, 2014), 500)])
+
+
+def test_year_counts_match_masks(table):
+    index = query.EventIndex(table)
+    for alert, tsunami in itertools.product(ALERTS, TSUNAMIS):
+        years, counts = index.year_counts[alert, tsunami]
+        rows = table.iloc[masked(table, alert, tsunami, None, None)]
+        expected = rows.time.dt.year.value_counts().sort_index()
+        assert list(years) == list(expected.index) and list(counts) == list(expected), (alert, tsunami)
+
+
+# Expected values worked out by hand with plotly.js Lib.interp
+@pytest.mark.parametrize('values, q1, median, q3', [
+    ([0, 10, 20, 30, 40, 50, 60], 12.5, 30, 47.5),
+    (list(range(1, 11)), 3, 5.5, 8),
+    ([4, 6], 4, 5, 6),
+    ([7], 7, 7, 7)
+])
+def test_box_quartiles_like_plotly(values, q1, median, q3):
+    stats = query.box_stats(np.array(values, dtype='float32'))
+    assert (stats['q1'], stats['median'], stats['q3']) == (q1, median, q3)
+
+
+def test_box_fences_and_outliers():
+    stats = query.box_stats(np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 100], dtype='float32'))
+    assert (stats['lowerfence'], stats['upperfence']) == (1, 9)
+    assert list(stats['outliers']) == [100]
+
+
+# Views as assets/view.js merges them: a modebar zoom then a pan keeps the scale of the zoom
+def test_geo_view_of_merged_relayout():
+    zoomed = {'geo.projection.scale': 8}
+    assert query.geo_view(zoomed) == (-45, 45, -22.5, 22.5)
+    panned = dict(zoomed, **{'geo.projection.rotation.lon': 139, 'geo.center.lon': 139, 'geo.center.lat': 36})
+    assert query.geo_view(panned) == (94, -176, 13.5, 58.5)
+
+
+def test_axis_view_of_one_axis():
+    assert query.axis_view({'xaxis.range[0]': '2015-01-01', 'xaxis.range[1]': '2015-12-31'}) == \
+        ('2015-01-01', '2015-12-31', None, None)
+    assert query.axis_view({}) is None
+
+
+def test_date_window_starts_no_earlier_than_earliest():
+    start, end = query.date_window('1900-01-01', '2000-01-31', earliest='2000-01-01')
+    assert (str(start), str(end)) == ('2000-01-01T00:00:00', '2000-02-01T00:00:00')
+    assert query.date_window('1900-01-01', '1999-12-31', earliest='2000-01-01') is None
+    assert str(query.date_window('1900-01-01', '2000-01-31')[0]) == '1900-01-01T00:00:00'
@@ -0,0 +1,71 @@
+import copy
+
+import pandas as pd
+import pytest
+
+import data
+from conftest import features
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def ms(text):
+    return int(pd.Timestamp(text).value // 10 ** 6)
+
+
+# Three events loaded, then USGS revises the second one and adds a fourth
+def catalogs():
+    first = features(3, ['2010-02-01', '2010-03-01', '2010-04-01'])
+    for i, feature in enumerate(first):
+        feature['properties']['updated'] = ms('2010-05-01') + i
+    second = copy.deepcopy(first)
+    second[1]['properties']['mag'] = 7.5
+    second[1]['properties']['updated'] = ms('2010-06-01')
+    added = features(4, ['2010-02-01', '2010-03-01', '2010-04-01', '2010-05-15'], seed=1)[3]
+    added['id'] = 'new00000001'
+    added['properties']['updated'] = ms('2010-06-02')
+    return first, second + [added]
+
+
+def test_sync_replaces_revised_and_adds_new(usgs, cache):
+    first, second = catalogs()
+    usgs(first)
+    store = data.EventStore('2010-01-01', None)
+    store.load()
+    assert store.watermarks(store.raw) == (pd.Timestamp('2010-04-01'), ms('2010-05-01') + 2)
+
+    usgs(second)
+    assert store.sync() == 2
+    df = store.df.set_index('id')
+    assert len(df) == 4
+    assert df.loc['syn00000001', 'magnitude'] == pytest.approx(7.5)
+    assert 'new00000001' in df.index
+    # The cache files of the open window hold the synced events
+    assert set(data.read_alert('2010-01-01', None, 'green').id) == set(df.index)
+
+
+def test_second_sync_without_changes(usgs, cache):
+    first, second = catalogs()
+    usgs(first)
+    store = data.EventStore('2010-01-01', None)
+    store.load()
+    server = usgs(second)
+    store.sync()
+    version = store.version
+    # Only events updated after the newest one stored are asked for, none are
+    assert store.sync() == 0
+    assert store.version == version
+    assert server.requests == 2 * len(data.ALERTS)
+
+
+def test_upsert_keeps_the_last_revision():
+    raw = data.normalize({'features': features(2, ['2010-02-01', '2010-03-01'])})
+    delta = pd.concat([raw.iloc[[1]], raw.iloc[[1]]], ignore_index=True)
+    delta.loc[1, 'magnitude'] = 6.25
+    found = data.upsert(raw, data.compact(delta)).set_index('id')
+    assert len(found) == 2
+    assert found.loc['syn00000001', 'magnitude'] == 6.25